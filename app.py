@@ -4,24 +4,139 @@ A股量化分析系统 - Web应用
 基于Flask框架
 """
 from flask import Flask, render_template, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 import os
-from datetime import datetime, timedelta
+import hashlib
+import logging
+import orjson
+from werkzeug.http import http_date
+from werkzeug.middleware.proxy_fix import ProxyFix
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 
 from backtest import backtest_stock, calc_score
 from data import get_stock_name, get_latest_price
-from auth import auth_bp, login_required
+from main import normalize_code
+from auth import auth_bp, login_required, init_app as init_auth
+from redis_client import get_redis
+from config import TRUST_PROXY
+
+
+def _json_default(obj):
+    """orjson无法直接序列化的类型（与Flask默认行为保持一致）"""
+    if isinstance(obj, date):
+        return http_date(obj)
+    if hasattr(obj, 'tolist'):  # pandas.Index等
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """基于orjson的JSON序列化，原生支持numpy标量，比标准库json快数倍"""
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_json_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+if TRUST_PROXY:
+    # 只信任一跳代理（Nginx）追加的X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
 CORS(app)
 
+logger = logging.getLogger(__name__)
+
+# 批量分析配置
+BATCH_MAX_CODES = 20     # 单次最多分析股票数
+BATCH_MAX_WORKERS = 8    # 并发线程数（回测以网络/数据库IO为主）
+
+# 分析结果缓存（同一交易日内回测结果不变）
+ANALYZE_CACHE_TTL = 6 * 3600   # 回测结果缓存6小时
+PRICE_CACHE_TTL = 60           # 最新价格缓存60秒
+
+# 可用策略列表（静态数据，响应体和ETag在启动时计算一次）
+STRATEGIES = [
+    {'id': 'MA+MACD', 'name': 'MA+MACD', 'description': '均线交叉 + MACD金叉死叉'},
+    {'id': 'Bollinger', 'name': '布林带', 'description': '布林带触底反弹和触顶回落'},
+    {'id': 'KDJ', 'name': 'KDJ', 'description': 'KDJ超卖超买区金叉死叉'},
+    {'id': 'RSI', 'name': 'RSI', 'description': 'RSI超卖超买反弹'},
+    {'id': 'Volume', 'name': '成交量突破', 'description': '放量突破前期高点'},
+    {'id': 'Combined', 'name': '综合策略', 'description': '多策略加权组合'}
+]
+STRATEGIES_MAX_AGE = 300  # 浏览器/nginx缓存5分钟
+_STRATEGIES_BODY = app.json.dumps({'success': True, 'data': STRATEGIES})
+_STRATEGIES_ETAG = hashlib.md5(_STRATEGIES_BODY.encode()).hexdigest()
+
+redis_client = get_redis()
+
 # 配置
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['JSON_AS_ASCII'] = False  # 支持中文
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)  # Session有效期24小时
 
+# Session存储到Redis（Cookie只保存session id），Redis不可用时使用默认的签名Cookie
+session_redis = get_redis(decode_responses=False)
+if session_redis is not None:
+    from flask_session import Session
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = session_redis
+    app.config['SESSION_PERMANENT'] = True
+    Session(app)
+
+# 响应压缩（批量分析结果通常超过50KB，JSON压缩率约5-10倍）
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 4       # 压缩率与CPU开销的折中
+app.config['COMPRESS_MIN_SIZE'] = 1024  # 小响应压缩收益不大
+Compress(app)
+
 # 注册认证蓝图
 app.register_blueprint(auth_bp)
+init_auth(app)
+
+
+# ==================== 缓存 ====================
+
+def _daily_cache_key(prefix, *parts):
+    """生成按交易日区分的缓存键，如 bt:000001.SZ:3:20240101"""
+    return ':'.join([prefix, *map(str, parts), datetime.now().strftime('%Y%m%d')])
+
+
+def _cache_get(key):
+    """读取缓存的JSON字符串，未命中或Redis不可用返回None"""
+    if redis_client is None:
+        return None
+    return redis_client.get(key)
+
+
+def _cache_set(key, value, ttl):
+    """写入缓存的JSON字符串"""
+    if redis_client is not None:
+        redis_client.setex(key, ttl, value)
+
+
+def _json_response(body):
+    """用已序列化的JSON字符串构造响应（缓存命中时跳过序列化）"""
+    return app.response_class(body, mimetype='application/json')
+
+
+def _get_latest_price_cached(code):
+    """获取最新价格（缓存60秒）"""
+    key = f'price:{code}'
+    cached = _cache_get(key)
+    if cached:
+        return app.json.loads(cached)
+
+    latest = get_latest_price(code)
+    if latest:
+        _cache_set(key, app.json.dumps(latest), PRICE_CACHE_TTL)
+    return latest
 
 
 # ==================== 路由 ====================
@@ -43,12 +158,17 @@ def analyze_stock(stock_code):
     """
     try:
         # 标准化股票代码
-        from main import normalize_code
         stock_code = normalize_code(stock_code)
 
         # 获取参数
         years = int(request.args.get('years', 3))
 
+        # 同一交易日内直接返回缓存结果
+        cache_key = _daily_cache_key('bt', stock_code, years)
+        cached = _cache_get(cache_key)
+        if cached:
+            return _json_response(cached)
+
         # 执行回测分析
         result = backtest_stock(stock_code, years=years)
 
@@ -59,7 +179,7 @@ def analyze_stock(stock_code):
             }), 404
 
         # 获取最新价格
-        latest = get_latest_price(stock_code)
+        latest = _get_latest_price_cached(stock_code)
 
         # 计算综合评分
         scores = calc_score(result)
@@ -80,7 +200,9 @@ def analyze_stock(stock_code):
             }
         }
 
-        return jsonify(response)
+        resp = jsonify(response)
+        _cache_set(cache_key, resp.get_data(as_text=True), ANALYZE_CACHE_TTL)
+        return resp
 
     except Exception as e:
         return jsonify({
@@ -108,35 +230,9 @@ def batch_analyze():
                 'message': '请提供股票代码列表'
             }), 400
 
-        results = []
-        for code in stock_codes[:20]:  # 限制最多20只
-            try:
-                from main import normalize_code
-                code = normalize_code(code)
-
-                result = backtest_stock(code, years=3)
-                if result:
-                    scores = calc_score(result)
-                    latest = get_latest_price(code)
-
-                    # 找最佳策略
-                    strategies = result.get('strategies', {})
-                    valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
-                    best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0)) if valid_strategies else None
-
-                    results.append({
-                        'code': code,
-                        'name': result['name'],
-                        'price': latest['close'] if latest else 0,
-                        'score': scores['total'] if scores else 0,
-                        'grade': scores['grade'] if scores else 'N/A',
-                        'best_strategy': best_strategy['strategy_name'] if best_strategy else 'N/A',
-                        'annual_return': best_strategy['annual_return'] if best_strategy else 0,
-                        'win_rate': best_strategy['win_rate'] if best_strategy else 0
-                    })
-            except Exception as e:
-                print(f"分析 {code} 失败: {e}")
-                continue
+        # 并发分析，结果保持请求顺序
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as executor:
+            results = [r for r in executor.map(_analyze_one, stock_codes[:BATCH_MAX_CODES]) if r]
 
         return jsonify({
             'success': True,
@@ -150,21 +246,52 @@ def batch_analyze():
         }), 500
 
 
+def _analyze_one(code):
+    """分析单只股票（批量分析的工作线程），失败返回None"""
+    try:
+        code = normalize_code(code)
+
+        cache_key = _daily_cache_key('batch', code)
+        cached = _cache_get(cache_key)
+        if cached:
+            return app.json.loads(cached)
+
+        result = backtest_stock(code, years=3, light=True)
+        if not result:
+            return None
+
+        scores = calc_score(result)
+        latest = _get_latest_price_cached(code)
+
+        # 找最佳策略
+        strategies = result.get('strategies', {})
+        valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
+        best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0)) if valid_strategies else None
+
+        item = {
+            'code': code,
+            'name': result['name'],
+            'price': latest['close'] if latest else 0,
+            'score': scores['total'] if scores else 0,
+            'grade': scores['grade'] if scores else 'N/A',
+            'best_strategy': best_strategy['strategy_name'] if best_strategy else 'N/A',
+            'annual_return': best_strategy['annual_return'] if best_strategy else 0,
+            'win_rate': best_strategy['win_rate'] if best_strategy else 0
+        }
+        _cache_set(cache_key, app.json.dumps(item), ANALYZE_CACHE_TTL)
+        return item
+    except Exception as e:
+        logger.warning(f"分析 {code} 失败: {e}")
+        return None
+
+
 @app.route('/api/strategies', methods=['GET'])
 def get_strategies():
     """获取可用策略列表"""
-    strategies = [
-        {'id': 'MA+MACD', 'name': 'MA+MACD', 'description': '均线交叉 + MACD金叉死叉'},
-        {'id': 'Bollinger', 'name': '布林带', 'description': '布林带触底反弹和触顶回落'},
-        {'id': 'KDJ', 'name': 'KDJ', 'description': 'KDJ超卖超买区金叉死叉'},
-        {'id': 'RSI', 'name': 'RSI', 'description': 'RSI超卖超买反弹'},
-        {'id': 'Volume', 'name': '成交量突破', 'description': '放量突破前期高点'},
-        {'id': 'Combined', 'name': '综合策略', 'description': '多策略加权组合'}
-    ]
-    return jsonify({
-        'success': True,
-        'data': strategies
-    })
+    resp = _json_response(_STRATEGIES_BODY)
+    resp.set_etag(_STRATEGIES_ETAG)
+    resp.headers['Cache-Control'] = f'public, max-age={STRATEGIES_MAX_AGE}'
+    return resp.make_conditional(request)
 
 
 @app.route('/api/search', methods=['GET'])
@@ -188,7 +315,6 @@ def search_stock():
 
     # 示例：如果是代码，直接返回
     if query.isdigit():
-        from main import normalize_code
         code = normalize_code(query)
         name = get_stock_name(code)
         if name != code:  # 找到了
@@ -203,11 +329,13 @@ def search_stock():
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口（用于监控）"""
-    return jsonify({
+    resp = jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0'
     })
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 
 # ==================== 错误处理 ====================
@@ -231,7 +359,7 @@ def internal_error(error):
 # ==================== 启动 ====================
 
 if __name__ == '__main__':
-    # 开发模式运行
+    # 开发模式运行；生产环境使用 gunicorn -c gunicorn_conf.py app:app
     app.run(
         host='0.0.0.0',
         port=5000,
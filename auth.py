@@ -6,18 +6,26 @@
 - Session管理
 """
 import os
+import re
 import sqlite3
-import random
-import string
-import io
-import base64
+import secrets
+import json
+import time
+import queue
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
 
-from flask import Blueprint, request, jsonify, session, render_template
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, Response, request, jsonify, session, render_template, g, abort
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from captcha.image import ImageCaptcha
 
+from redis_client import get_redis
+
+__all__ = ['auth_bp', 'login_required', 'get_current_user', 'init_app']
+
 # 创建蓝图
 auth_bp = Blueprint('auth', __name__)
 
@@ -25,18 +33,78 @@ auth_bp = Blueprint('auth', __name__)
 CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')
 USER_DB_PATH = os.path.join(CACHE_DIR, 'users.db')
 
-# 验证码存储路径（使用SQLite，解决多进程问题）
+# 验证码存储路径（Redis不可用时使用SQLite，解决多进程问题）
 CAPTCHA_DB_PATH = os.path.join(CACHE_DIR, 'captcha.db')
 
+# 用户查询语句（UNIQUE约束自带索引，固定SQL文本以复用sqlite3语句缓存）
+SELECT_USER_BY_USERNAME = (
+    'SELECT id, username, password_hash, login_attempts, locked_until '
+    'FROM users WHERE username = ?'
+)
+SELECT_USER_BY_ID = 'SELECT id, username, created_at, last_login FROM users WHERE id = ?'
 
-def get_captcha_db():
-    """获取验证码数据库连接"""
+# 注册校验规则（与注册页面的前端校验一致）
+USERNAME_RE = re.compile(r'[A-Za-z0-9]{3,20}')
+PASSWORD_RE = re.compile(r'(?=.*[A-Za-z])(?=.*[0-9]).{8,}', re.DOTALL)
+
+# 验证码有效期（秒）
+CAPTCHA_EXPIRE_SECONDS = 300
+
+# 预生成验证码图片池大小
+CAPTCHA_POOL_SIZE = 200
+
+# SQLite模式下过期验证码的清理间隔（秒）
+CAPTCHA_CLEANUP_INTERVAL = 60
+
+# 登录失败锁定：连续失败5次锁定15分钟
+MAX_LOGIN_ATTEMPTS = 5
+LOGIN_LOCK_SECONDS = 15 * 60
+
+# 按IP限流：每个IP每分钟最多30次请求（依赖Redis）
+IP_RATE_LIMIT = 30
+IP_RATE_WINDOW = 60
+
+# 用户信息缓存有效期（秒）
+USER_CACHE_TTL = 600
+# 不存在的用户名缓存有效期（秒），注册时立即清除；取值较短，清除失败时新用户最多等待这么久
+MISSING_USER_TTL = 60
+
+# 密码哈希（argon2id，比werkzeug默认的pbkdf2/scrypt单次校验更快）
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+# 用户不存在时用于空跑校验，使响应耗时与密码错误一致，避免通过耗时探测用户名
+_DUMMY_HASH = password_hasher.hash('dummy-password')
+
+# Redis连接（不可用时为None）；验证码图片为二进制，读取时使用不解码的连接
+redis_client = get_redis()
+redis_binary = get_redis(decode_responses=False)
+
+
+def _connect(db_path):
+    """打开SQLite连接（WAL模式，降低写入提交延迟）"""
     os.makedirs(CACHE_DIR, exist_ok=True)
-    conn = sqlite3.connect(CAPTCHA_DB_PATH)
+    conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
     return conn
 
 
+def close_db(exception=None):
+    """请求结束时关闭本次请求使用的数据库连接"""
+    for name in ('user_db', 'captcha_db'):
+        conn = g.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+
+def get_captcha_db():
+    """获取验证码数据库连接（同一请求内复用）"""
+    if 'captcha_db' not in g:
+        g.captcha_db = _connect(CAPTCHA_DB_PATH)
+    return g.captcha_db
+
+
 def init_captcha_db():
     """初始化验证码数据库"""
     conn = get_captcha_db()
@@ -45,20 +113,25 @@ def init_captcha_db():
         CREATE TABLE IF NOT EXISTS captchas (
             captcha_id VARCHAR(32) PRIMARY KEY,
             code VARCHAR(10) NOT NULL,
+            image BLOB,
             expires_at DATETIME NOT NULL
         )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_captcha_exp ON captchas(expires_at)')
+
+    # 兼容旧表：补充图片列
+    columns = {row['name'] for row in cursor.execute('PRAGMA table_info(captchas)')}
+    if 'image' not in columns:
+        cursor.execute('ALTER TABLE captchas ADD COLUMN image BLOB')
     conn.commit()
-    conn.close()
 
 # ==================== 数据库操作 ====================
 
 def get_db():
-    """获取数据库连接"""
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    conn = sqlite3.connect(USER_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """获取数据库连接（同一请求内复用）"""
+    if 'user_db' not in g:
+        g.user_db = _connect(USER_DB_PATH)
+    return g.user_db
 
 
 def init_db():
@@ -79,25 +152,85 @@ def init_db():
     ''')
 
     conn.commit()
-    conn.close()
+
+
+def _get_cached_user(key):
+    """从Redis读取缓存的用户信息，未命中返回None"""
+    if redis_client is None:
+        return None
+    data = redis_client.get(key)
+    return json.loads(data) if data else None
+
+
+def _set_cached_user(key, user):
+    """缓存用户信息（sqlite3.Row转为dict后JSON序列化，仅用于不含密码哈希/锁定状态的查询结果）"""
+    if redis_client is not None and user is not None:
+        redis_client.setex(key, USER_CACHE_TTL, json.dumps(dict(user)))
+
+
+def _invalidate_user_cache(user_id):
+    """用户信息变更后清除缓存"""
+    if redis_client is not None:
+        redis_client.delete(f'user:{user_id}')
+
+
+def init_app(app):
+    """初始化认证数据库（应用启动时调用一次，避免import时执行DDL）"""
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        init_db()
+        # 验证码存储在Redis时无需SQLite表
+        if redis_client is None:
+            init_captcha_db()
 
 
 def get_user_by_username(username):
-    """根据用户名获取用户"""
+    """根据用户名获取用户（含密码哈希与锁定状态，不写入Redis缓存）"""
+    # 只缓存“用户不存在”：撞库请求重复尝试同一用户名时不再查SQLite；
+    # Redis数据丢失时只是多查一次数据库，不会把已注册用户挡在外面
+    missing_key = f'nouser:{username}'
+    if redis_client is not None and redis_client.exists(missing_key):
+        return None
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+    cursor.execute(SELECT_USER_BY_USERNAME, (username,))
     user = cursor.fetchone()
-    conn.close()
+
+    if user is None and redis_client is not None:
+        redis_client.setex(missing_key, MISSING_USER_TTL, 1)
     return user
 
 
+def hash_password(password):
+    """生成密码哈希（argon2id）"""
+    return password_hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    """校验密码，兼容旧版werkzeug格式的哈希"""
+    if password_hash.startswith('$argon2'):
+        try:
+            return password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def password_needs_rehash(password_hash):
+    """旧格式或参数已变更的哈希需要在登录成功后重新生成"""
+    if not password_hash.startswith('$argon2'):
+        return True
+    return password_hasher.check_needs_rehash(password_hash)
+
+
 def create_user(username, password):
     """创建新用户"""
     conn = get_db()
     cursor = conn.cursor()
 
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
 
     try:
         cursor.execute(
@@ -105,11 +238,11 @@ def create_user(username, password):
             (username, password_hash)
         )
         conn.commit()
+        if redis_client is not None:
+            redis_client.delete(f'nouser:{username}')
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 
 def update_login_attempts(username, attempts, locked_until=None):
@@ -121,95 +254,270 @@ def update_login_attempts(username, attempts, locked_until=None):
         (attempts, locked_until, username)
     )
     conn.commit()
-    conn.close()
 
 
-def update_last_login(username):
+def update_password_hash(username, password_hash):
+    """更新密码哈希（旧格式迁移）"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(
+        'UPDATE users SET password_hash = ? WHERE username = ?',
+        (password_hash, username)
+    )
+    conn.commit()
+
+
+def update_last_login(user_id):
     """更新最后登录时间"""
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
-        'UPDATE users SET last_login = ?, login_attempts = 0, locked_until = NULL WHERE username = ?',
-        (datetime.now(), username)
+        'UPDATE users SET last_login = ?, login_attempts = 0, locked_until = NULL WHERE id = ?',
+        (datetime.now(), user_id)
     )
     conn.commit()
-    conn.close()
+    _invalidate_user_cache(user_id)
 
 
 # ==================== 验证码 ====================
 
-def generate_captcha():
-    """生成数字验证码"""
-    # 生成4位数字验证码
-    code = ''.join(random.choices(string.digits, k=4))
+_captcha_image = ImageCaptcha(width=120, height=40)
+_captcha_pool = queue.Queue(maxsize=CAPTCHA_POOL_SIZE)
+_captcha_pool_lock = threading.Lock()
+_captcha_pool_started = False
+_captcha_cleanup_started = False
+
 
-    # 生成验证码图片
-    image = ImageCaptcha(width=120, height=40)
-    data = image.generate(code)
+def _render_captcha():
+    """生成4位数字验证码及其PNG图片"""
+    code = f'{secrets.randbelow(10000):04d}'
+    data = _captcha_image.generate(code)
+    return code, data.getvalue()
 
-    # 转换为base64
-    img_base64 = base64.b64encode(data.getvalue()).decode()
+
+def _captcha_renderer():
+    """返回渲染函数：gevent打补丁后后台线程实为协程，渲染放到hub线程池（原生线程）执行，避免占住事件循环"""
+    try:
+        from gevent import monkey, get_hub
+    except ImportError:
+        return _render_captcha
+    if not monkey.is_module_patched('threading'):
+        return _render_captcha
+    threadpool = get_hub().threadpool
+    return lambda: threadpool.apply(_render_captcha)
+
+
+def _fill_captcha_pool():
+    """后台线程：持续预生成验证码图片，池满时阻塞等待"""
+    render = _captcha_renderer()
+    while True:
+        _captcha_pool.put(render())
+
+
+def _start_captcha_pool():
+    """首次使用时启动预生成线程（每个worker进程各自启动，fork后线程不会继承）"""
+    global _captcha_pool_started
+    if _captcha_pool_started:
+        return
+    with _captcha_pool_lock:
+        if not _captcha_pool_started:
+            threading.Thread(target=_fill_captcha_pool, name='captcha-pool', daemon=True).start()
+            _captcha_pool_started = True
+
+
+def generate_captcha():
+    """生成数字验证码（优先从预生成池取图片，请求线程无需渲染）"""
+    _start_captcha_pool()
+    try:
+        code, image = _captcha_pool.get_nowait()
+    except queue.Empty:
+        code, image = _render_captcha()
 
     # 生成唯一ID
-    captcha_id = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
+    captcha_id = secrets.token_urlsafe(12)
+
+    _save_captcha(captcha_id, code, image)
+
+    return captcha_id
+
+
+def verify_captcha(captcha_id, code):
+    """验证验证码"""
+    if not captcha_id or not code:
+        return False
+
+    stored_code = _pop_captcha(captcha_id)
+    return stored_code is not None and stored_code == code
 
-    # 存储到数据库（5分钟有效）
-    expires_at = datetime.now() + timedelta(minutes=5)
+
+def _save_captcha(captcha_id, code, image):
+    """保存验证码及其图片（5分钟有效）"""
+    if redis_client is not None:
+        # Redis自动过期，无需手动清理
+        pipe = redis_client.pipeline()
+        pipe.setex(f'captcha:{captcha_id}', CAPTCHA_EXPIRE_SECONDS, code)
+        pipe.setex(f'captcha:img:{captcha_id}', CAPTCHA_EXPIRE_SECONDS, image)
+        pipe.execute()
+        return
+
+    expires_at = datetime.now() + timedelta(seconds=CAPTCHA_EXPIRE_SECONDS)
     conn = get_captcha_db()
     cursor = conn.cursor()
     cursor.execute(
-        'INSERT OR REPLACE INTO captchas (captcha_id, code, expires_at) VALUES (?, ?, ?)',
-        (captcha_id, code, expires_at.isoformat())
+        'INSERT OR REPLACE INTO captchas (captcha_id, code, image, expires_at) VALUES (?, ?, ?, ?)',
+        (captcha_id, code, image, expires_at.isoformat())
     )
     conn.commit()
-    conn.close()
 
-    # 清理过期验证码
-    cleanup_expired_captcha()
+    _start_captcha_cleanup()
 
-    return captcha_id, img_base64
 
-
-def verify_captcha(captcha_id, code):
-    """验证验证码"""
-    if not captcha_id or not code:
-        return False
+def _pop_captcha(captcha_id):
+    """取出验证码并销毁（用后即销毁），不存在或已过期返回None"""
+    if redis_client is not None:
+        redis_client.delete(f'captcha:img:{captcha_id}')
+        # GETDEL 原子地读取并删除
+        return redis_client.getdel(f'captcha:{captcha_id}')
 
     conn = get_captcha_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM captchas WHERE captcha_id = ?', (captcha_id,))
+    cursor.execute('SELECT code, expires_at FROM captchas WHERE captcha_id = ?', (captcha_id,))
     captcha_data = cursor.fetchone()
 
     if not captcha_data:
-        conn.close()
-        return False
+        return None
+
+    cursor.execute('DELETE FROM captchas WHERE captcha_id = ?', (captcha_id,))
+    conn.commit()
 
     # 检查是否过期
-    expires_at = datetime.fromisoformat(captcha_data['expires_at'])
-    if datetime.now() > expires_at:
-        cursor.execute('DELETE FROM captchas WHERE captcha_id = ?', (captcha_id,))
-        conn.commit()
-        conn.close()
-        return False
+    if datetime.now() > datetime.fromisoformat(captcha_data['expires_at']):
+        return None
 
-    # 验证
-    is_valid = captcha_data['code'] == code
+    return captcha_data['code']
 
-    # 用后即销毁
-    cursor.execute('DELETE FROM captchas WHERE captcha_id = ?', (captcha_id,))
-    conn.commit()
-    conn.close()
 
-    return is_valid
+def get_captcha_image(captcha_id):
+    """读取验证码PNG图片，不存在或已过期返回None"""
+    if redis_binary is not None:
+        return redis_binary.get(f'captcha:img:{captcha_id}')
 
+    conn = get_captcha_db()
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT image FROM captchas WHERE captcha_id = ? AND expires_at >= ?',
+        (captcha_id, datetime.now().isoformat())
+    )
+    row = cursor.fetchone()
+    return row['image'] if row else None
 
-def cleanup_expired_captcha():
+
+def cleanup_expired_captcha(conn=None):
     """清理过期的验证码"""
-    conn = get_captcha_db()
+    conn = conn or get_captcha_db()
     cursor = conn.cursor()
     cursor.execute('DELETE FROM captchas WHERE expires_at < ?', (datetime.now().isoformat(),))
     conn.commit()
-    conn.close()
+
+
+def _captcha_cleanup_loop():
+    """后台线程：定期清理过期验证码（不在签发验证码的请求中执行）"""
+    while True:
+        time.sleep(CAPTCHA_CLEANUP_INTERVAL)
+        conn = _connect(CAPTCHA_DB_PATH)
+        try:
+            cleanup_expired_captcha(conn)
+        except sqlite3.Error as e:
+            print(f"清理过期验证码失败: {e}")
+        finally:
+            conn.close()
+
+
+def _start_captcha_cleanup():
+    """首次写入SQLite验证码时启动清理线程（每个worker进程各自启动）"""
+    global _captcha_cleanup_started
+    if _captcha_cleanup_started:
+        return
+    with _captcha_pool_lock:
+        if not _captcha_cleanup_started:
+            threading.Thread(target=_captcha_cleanup_loop, name='captcha-cleanup', daemon=True).start()
+            _captcha_cleanup_started = True
+
+
+# ==================== 登录限流 ====================
+
+def _client_ip():
+    """获取客户端IP（不信任客户端可伪造的请求头；经Nginx代理时由ProxyFix改写remote_addr）"""
+    return request.remote_addr
+
+
+def rate_limit(f):
+    """按IP限流装饰器（Redis不可用时不限流）"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if redis_client is not None:
+            key = f'ip:{_client_ip()}'
+            # INCR与EXPIRE放在同一事务中，避免中途异常留下无过期时间的计数
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.incr(key)
+            pipe.expire(key, IP_RATE_WINDOW, nx=True)
+            count = pipe.execute()[0]
+            if count > IP_RATE_LIMIT:
+                return jsonify({
+                    'success': False,
+                    'message': '请求过于频繁，请稍后再试',
+                    'code': 'TOO_MANY_REQUESTS'
+                }), 429
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _login_lock_remaining(user):
+    """账户剩余锁定时间（分钟），未锁定返回0"""
+    if redis_client is not None:
+        key = f"fail:{user['username']}"
+        attempts = redis_client.get(key)
+        if attempts and int(attempts) >= MAX_LOGIN_ATTEMPTS:
+            return max((redis_client.ttl(key) + 59) // 60, 1)
+        return 0
+
+    if user['locked_until']:
+        locked_until = datetime.fromisoformat(user['locked_until'])
+        if datetime.now() < locked_until:
+            return int((locked_until - datetime.now()).total_seconds() / 60) + 1
+    return 0
+
+
+def _record_login_failure(user):
+    """记录一次密码错误，返回累计失败次数（达到上限时锁定账户）"""
+    username = user['username']
+
+    if redis_client is not None:
+        # Redis计数，不写数据库
+        key = f'fail:{username}'
+        # 失败计数15分钟内有效：INCR与EXPIRE同一事务执行，不会留下永不过期的计数（永久锁定）
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, LOGIN_LOCK_SECONDS, nx=True)
+        attempts = pipe.execute()[0]
+        if attempts >= MAX_LOGIN_ATTEMPTS:
+            # 达到上限后从此刻起锁定15分钟
+            redis_client.expire(key, LOGIN_LOCK_SECONDS)
+        return attempts
+
+    attempts = user['login_attempts'] + 1
+    if attempts >= MAX_LOGIN_ATTEMPTS:
+        locked_until = datetime.now() + timedelta(seconds=LOGIN_LOCK_SECONDS)
+        update_login_attempts(username, attempts, locked_until.isoformat())
+    else:
+        update_login_attempts(username, attempts)
+    return attempts
+
+
+def _clear_login_failures(username):
+    """登录成功后清除失败计数（数据库中的计数由update_last_login重置）"""
+    if redis_client is not None:
+        redis_client.delete(f'fail:{username}')
 
 
 # ==================== 登录状态检查 ====================
@@ -233,31 +541,47 @@ def get_current_user():
     if 'user_id' not in session:
         return None
 
+    cache_key = f"user:{session['user_id']}"
+    user = _get_cached_user(cache_key)
+    if user:
+        return user
+
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT id, username, created_at, last_login FROM users WHERE id = ?',
-                   (session['user_id'],))
+    cursor.execute(SELECT_USER_BY_ID, (session['user_id'],))
     user = cursor.fetchone()
-    conn.close()
+
+    _set_cached_user(cache_key, user)
     return user
 
 
 # ==================== API 路由 ====================
 
 @auth_bp.route('/api/auth/captcha', methods=['GET'])
+@rate_limit
 def get_captcha():
-    """获取图形验证码"""
-    captcha_id, img_base64 = generate_captcha()
+    """获取图形验证码ID，图片通过 /api/auth/captcha/<captcha_id>.png 获取"""
+    captcha_id = generate_captcha()
 
     return jsonify({
         'success': True,
         'data': {
             'captcha_id': captcha_id,
-            'image': f'data:image/png;base64,{img_base64}'
+            'image': f'/api/auth/captcha/{captcha_id}.png'
         }
     })
 
 
+@auth_bp.route('/api/auth/captcha/<captcha_id>.png', methods=['GET'])
+def get_captcha_png(captcha_id):
+    """获取验证码PNG图片"""
+    image = get_captcha_image(captcha_id)
+    if image is None:
+        abort(404)
+
+    return Response(image, mimetype='image/png', headers={'Cache-Control': 'no-store'})
+
+
 @auth_bp.route('/api/auth/register', methods=['POST'])
 def register():
     """用户注册"""
@@ -268,29 +592,17 @@ def register():
     confirm_password = data.get('confirm_password', '')
 
     # 验证用户名
-    if not username or len(username) < 3 or len(username) > 20:
-        return jsonify({
-            'success': False,
-            'message': '用户名长度应为3-20个字符'
-        }), 400
-
-    if not username.isalnum():
+    if not USERNAME_RE.fullmatch(username):
         return jsonify({
             'success': False,
-            'message': '用户名只能包含字母和数字'
+            'message': '用户名应为3-20位字母或数字'
         }), 400
 
     # 验证密码
-    if len(password) < 8:
+    if not PASSWORD_RE.fullmatch(password):
         return jsonify({
             'success': False,
-            'message': '密码长度至少8位'
-        }), 400
-
-    if not any(c.isalpha() for c in password) or not any(c.isdigit() for c in password):
-        return jsonify({
-            'success': False,
-            'message': '密码必须包含字母和数字'
+            'message': '密码至少8位，且必须包含字母和数字'
         }), 400
 
     if password != confirm_password:
@@ -320,6 +632,7 @@ def register():
 
 
 @auth_bp.route('/api/auth/login', methods=['POST'])
+@rate_limit
 def login():
     """用户登录"""
     data = request.get_json()
@@ -331,39 +644,34 @@ def login():
     user = get_user_by_username(username)
 
     if not user:
+        verify_password(_DUMMY_HASH, password)
         return jsonify({
             'success': False,
             'message': '用户名或密码错误'
         }), 401
 
     # 检查是否被锁定
-    if user['locked_until']:
-        locked_until = datetime.fromisoformat(user['locked_until'])
-        if datetime.now() < locked_until:
-            remaining = int((locked_until - datetime.now()).total_seconds() / 60) + 1
-            return jsonify({
-                'success': False,
-                'message': f'账户已锁定，请{remaining}分钟后再试'
-            }), 403
+    remaining = _login_lock_remaining(user)
+    if remaining:
+        return jsonify({
+            'success': False,
+            'message': f'账户已锁定，请{remaining}分钟后再试'
+        }), 403
 
     # 验证密码
-    if not check_password_hash(user['password_hash'], password):
+    if not verify_password(user['password_hash'], password):
         # 增加失败次数
-        attempts = user['login_attempts'] + 1
+        attempts = _record_login_failure(user)
 
-        if attempts >= 5:
-            # 锁定15分钟
-            locked_until = datetime.now() + timedelta(minutes=15)
-            update_login_attempts(username, attempts, locked_until.isoformat())
+        if attempts >= MAX_LOGIN_ATTEMPTS:
             return jsonify({
                 'success': False,
                 'message': '密码错误次数过多，账户已锁定15分钟'
             }), 403
         else:
-            update_login_attempts(username, attempts)
             return jsonify({
                 'success': False,
-                'message': f'用户名或密码错误，还剩{5 - attempts}次机会'
+                'message': f'用户名或密码错误，还剩{MAX_LOGIN_ATTEMPTS - attempts}次机会'
             }), 401
 
     # 登录成功
@@ -372,7 +680,10 @@ def login():
     session['username'] = user['username']
     session.permanent = True
 
-    update_last_login(username)
+    if password_needs_rehash(user['password_hash']):
+        update_password_hash(username, hash_password(password))
+    update_last_login(user['id'])
+    _clear_login_failures(username)
 
     return jsonify({
         'success': True,
@@ -427,8 +738,3 @@ def login_page():
 def register_page():
     """注册页面"""
     return render_template('register.html')
-
-
-# 初始化数据库
-init_db()
-init_captcha_db()
@@ -3,10 +3,16 @@
 基于策略信号进行模拟交易回测
 支持：MA+MACD、布林带、KDJ、RSI、成交量突破五种策略
 """
+import os
+import glob
+import time
+import pickle
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from config import BACKTEST_PERIODS
+from config import BACKTEST_PERIODS, CACHE_DIR
+from numba_compat import njit, NUMBA_AVAILABLE
 
 
 # ==================== 辅助计算函数 ====================
@@ -27,59 +33,48 @@ def _calculate_annual_return(total_return: float, days: int) -> float:
     return ((1 + total_return / 100) ** (365 / days) - 1) * 100
 
 
-def _calculate_max_drawdown(equity_curve: list) -> float:
+def _calculate_max_drawdown(values: np.ndarray) -> float:
     """
     计算最大回撤
 
     Args:
-        equity_curve: 权益曲线 [(date, value), ...]
+        values: 权益曲线数值序列
 
     Returns:
         最大回撤(%)
     """
-    if not equity_curve:
+    if values.size == 0:
         return 0.0
 
-    values = [v for _, v in equity_curve]
-    max_dd = 0.0
-    peak = values[0]
+    peaks = np.maximum.accumulate(values)
+    dd = np.where(peaks > 0, (peaks - values) / peaks, 0.0)
+    return float(dd.max() * 100)
 
-    for value in values:
-        if value > peak:
-            peak = value
-        dd = (peak - value) / peak * 100
-        if dd > max_dd:
-            max_dd = dd
 
-    return max_dd
-
-
-def _calculate_sharpe_ratio(equity_curve: list, risk_free_rate: float = 0.03) -> float:
+def _calculate_sharpe_ratio(values: np.ndarray, risk_free_rate: float = 0.03) -> float:
     """
     计算夏普比率
 
     Args:
-        equity_curve: 权益曲线 [(date, value), ...]
+        values: 权益曲线数值序列
         risk_free_rate: 年化无风险利率，默认3%
 
     Returns:
         夏普比率
     """
-    if len(equity_curve) < 2:
+    if values.size < 2:
         return 0.0
 
-    # 计算日收益率序列
-    daily_returns = []
-    for i in range(1, len(equity_curve)):
-        if equity_curve[i-1][1] > 0:
-            ret = (equity_curve[i][1] - equity_curve[i-1][1]) / equity_curve[i-1][1]
-            daily_returns.append(ret)
+    # 计算日收益率序列（跳过前一日权益非正的点）
+    prev = values[:-1]
+    valid = prev > 0
+    daily_returns = np.diff(values)[valid] / prev[valid]
 
-    if not daily_returns:
+    if daily_returns.size == 0:
         return 0.0
 
-    mean_return = np.mean(daily_returns)
-    std_return = np.std(daily_returns)
+    mean_return = daily_returns.mean()
+    std_return = daily_returns.std()
 
     if std_return == 0:
         return 0.0
@@ -90,13 +85,50 @@ def _calculate_sharpe_ratio(equity_curve: list, risk_free_rate: float = 0.03) ->
     return sharpe
 
 
+@njit(cache=True)
+def _signals_to_positions(sig: np.ndarray) -> np.ndarray:
+    """
+    逐日扫描信号得到持仓状态（买入信号且空仓 -> 满仓，卖出信号且持仓 -> 空仓）
+    多个策略的信号按列排列，一次扫描同时更新所有策略的持仓
+    """
+    n, m = sig.shape
+    held = np.empty((n, m), np.bool_)
+    position = np.zeros(m, np.bool_)
+    for i in range(n):
+        for j in range(m):
+            s = sig[i, j]
+            if s == 1 and not position[j]:
+                position[j] = True
+            elif s == -1 and position[j]:
+                position[j] = False
+            held[i, j] = position[j]
+    return held
+
+
+def _calculate_positions(sig: np.ndarray) -> np.ndarray:
+    """
+    计算每日收盘后的持仓状态
+
+    Args:
+        sig: 信号矩阵 (交易日数, 策略数)
+
+    无numba时等价地取“最近一个非零信号是否为买入”，用前向填充代替逐行循环
+    """
+    if NUMBA_AVAILABLE:
+        return _signals_to_positions(sig)
+    last_idx = np.where(sig != 0, np.arange(sig.shape[0])[:, None], 0)
+    last_idx = np.maximum.accumulate(last_idx, axis=0)
+    return np.take_along_axis(sig, last_idx, axis=0) == 1
+
+
 # ==================== 核心回测引擎 ====================
 
 def backtest_strategy(
     df: pd.DataFrame,
     signal_column: str,
     strategy_name: str,
-    initial_capital: float = 1.0
+    initial_capital: float = 1.0,
+    light: bool = False
 ) -> dict:
     """
     对单个策略进行信号驱动回测
@@ -106,6 +138,7 @@ def backtest_strategy(
         signal_column: 信号列名 ('signal', 'signal_boll', 'signal_kdj')
         strategy_name: 策略名称
         initial_capital: 初始资金(默认1.0用于计算收益率)
+        light: 只计算汇总统计，不生成逐笔交易记录和权益曲线（评分场景使用）
 
     Returns:
         回测结果字典
@@ -113,122 +146,156 @@ def backtest_strategy(
     if df.empty or signal_column not in df.columns:
         return _empty_result(strategy_name)
 
-    # 初始化
-    capital = initial_capital
-    position = 0  # 0=空仓, 1=满仓
-    holding_shares = 0
-    entry_price = 0
-    entry_date = None
-    trades = []
-    equity_curve = []
-
-    # 遍历数据
-    for i in range(len(df)):
-        row = df.iloc[i]
-        date = df.index[i]
-        price = row['close']
-        signal = row[signal_column]
-
-        # 计算当前权益
-        if position > 0:
-            current_value = holding_shares * price
-        else:
-            current_value = capital
-        equity_curve.append((date, current_value))
-
-        # 处理信号
-        if signal == 1 and position == 0:
-            # 买入信号且空仓 -> 全仓买入
-            position = 1
-            entry_price = price
-            entry_date = date
-            holding_shares = capital / price
-            capital = 0
-
-        elif signal == -1 and position > 0:
-            # 卖出信号且持仓 -> 全仓卖出
-            exit_price = price
-            exit_date = date
-            capital = holding_shares * exit_price
-
-            # 记录交易
-            trade = {
-                'entry_date': entry_date,
-                'entry_price': entry_price,
-                'exit_date': exit_date,
-                'exit_price': exit_price,
-                'return': (exit_price - entry_price) / entry_price * 100,
-                'return_abs': capital - initial_capital,
-                'hold_days': (exit_date - entry_date).days,
-                'trade_type': 'long'
-            }
-            trades.append(trade)
+    dates = df.index
+    close = df['close'].to_numpy(dtype=np.float64)
+    sig = df[signal_column].to_numpy(dtype=np.int8)
+
+    # 从未出现买入信号则不会有交易，无需扫描
+    if not (sig == 1).any():
+        return _empty_result(strategy_name)
+
+    # 持仓状态：买入信号且空仓 -> 满仓，卖出信号且持仓 -> 空仓，无信号保持不变
+    held = _calculate_positions(sig[:, None])[:, 0]
+
+    return _backtest_positions(dates, close, held, signal_column, strategy_name, initial_capital, light)
 
-            # 重置持仓
-            position = 0
-            holding_shares = 0
-            entry_price = 0
-            entry_date = None
 
-    # 如果回测结束时还持仓，强制平仓
-    if position > 0:
-        exit_price = df.iloc[-1]['close']
-        exit_date = df.index[-1]
-        capital = holding_shares * exit_price
+def backtest_all_strategies(
+    df: pd.DataFrame,
+    strategy_configs,
+    initial_capital: float = 1.0,
+    light: bool = False
+) -> dict:
+    """
+    一次性回测多个策略：收盘价和信号矩阵只提取一次，持仓状态一次扫描得到
 
-        trade = {
+    Args:
+        df: 包含信号的DataFrame
+        strategy_configs: [(信号列名, 策略名称), ...]
+        initial_capital: 初始资金
+        light: 只计算汇总统计，不生成逐笔交易记录和权益曲线
+
+    Returns:
+        {策略名称: 回测结果字典}
+    """
+    strategies = {name: _empty_result(name) for _, name in strategy_configs}
+    configs = [(col, name) for col, name in strategy_configs if col in df.columns]
+    if df.empty or not configs:
+        return strategies
+
+    dates = df.index
+    close = df['close'].to_numpy(dtype=np.float64)
+    sigs = df[[col for col, _ in configs]].to_numpy(dtype=np.int8)
+
+    # 从未出现买入信号的策略不会有交易，直接保留空结果
+    active = np.flatnonzero((sigs == 1).any(axis=0))
+    if active.size == 0:
+        return strategies
+    held = _calculate_positions(sigs[:, active])
+
+    for j, k in enumerate(active):
+        signal_column, strategy_name = configs[k]
+        strategies[strategy_name] = _backtest_positions(
+            dates, close, held[:, j], signal_column, strategy_name, initial_capital, light
+        )
+    return strategies
+
+
+def _backtest_positions(
+    dates: pd.DatetimeIndex,
+    close: np.ndarray,
+    held: np.ndarray,
+    signal_column: str,
+    strategy_name: str,
+    initial_capital: float,
+    light: bool = False
+) -> dict:
+    """根据每日持仓状态生成交易记录和统计指标，light=True时只生成统计指标"""
+    # 买卖点：空仓->满仓为买入，满仓->空仓为卖出；回测结束时还持仓则在最后一天强制平仓
+    prev_held = np.concatenate(([False], held[:-1]))
+    entries = np.flatnonzero(held & ~prev_held)
+    exits = np.flatnonzero(~held & prev_held)
+    if len(exits) < len(entries):
+        exits = np.append(exits, len(held) - 1)
+
+    if len(entries) == 0:
+        return _empty_result(strategy_name)
+
+    # 逐笔资金：每笔全仓买入、全仓卖出
+    entry_prices = close[entries]
+    exit_prices = close[exits]
+    capitals = initial_capital * np.cumprod(exit_prices / entry_prices)   # 每笔卖出后资金
+    capitals_before = np.concatenate(([initial_capital], capitals[:-1]))  # 每笔买入时资金
+    shares = capitals_before / entry_prices
+
+    # 权益曲线：当天先按前一天的持仓估值，再处理当天信号
+    trade_no = np.concatenate(([0], np.cumsum(held & ~prev_held)[:-1]))  # 截至前一天已开仓笔数
+    cash_levels = np.concatenate(([initial_capital], capitals))
+    equity_values = np.where(
+        prev_held,
+        shares[trade_no - 1] * close,
+        cash_levels[trade_no]
+    )
+
+    # 记录交易
+    returns = (exit_prices - entry_prices) / entry_prices * 100
+    returns_abs = capitals - initial_capital
+    day_values = dates.values.astype('datetime64[D]')
+    hold_days = (day_values[exits] - day_values[entries]).astype(np.int64)
+    trades = [] if light else [
+        {
             'entry_date': entry_date,
             'entry_price': entry_price,
             'exit_date': exit_date,
             'exit_price': exit_price,
-            'return': (exit_price - entry_price) / entry_price * 100,
-            'return_abs': capital - initial_capital,
-            'hold_days': (exit_date - entry_date).days,
+            'return': ret,
+            'return_abs': ret_abs,
+            'hold_days': days,
             'trade_type': 'long'
         }
-        trades.append(trade)
-        position = 0
+        for entry_date, entry_price, exit_date, exit_price, ret, ret_abs, days in zip(
+            dates[entries], entry_prices, dates[exits], exit_prices, returns, returns_abs, hold_days.tolist()
+        )
+    ]
+    capital = capitals[-1]
 
     # 计算统计指标
     final_value = capital
     total_return = (final_value - initial_capital) / initial_capital * 100
 
-    # 交易统计
-    trade_count = len(trades)
-    if trade_count == 0:
-        return _empty_result(strategy_name)
-
-    win_trades = [t for t in trades if t['return'] > 0]
-    loss_trades = [t for t in trades if t['return'] <= 0]
-    win_count = len(win_trades)
-    loss_count = len(loss_trades)
-    win_rate = win_count / trade_count * 100 if trade_count > 0 else 0
+    # 交易统计（直接在逐笔收益数组上用掩码统计；收益为NaN的交易既不算盈利也不算亏损）
+    trade_count = len(returns)
+    wins = returns > 0
+    losses = returns <= 0
+    win_count = int(wins.sum())
+    loss_count = int(losses.sum())
+    win_rate = win_count / trade_count * 100
 
-    avg_win = np.mean([t['return'] for t in win_trades]) if win_trades else 0
-    avg_loss = np.mean([t['return'] for t in loss_trades]) if loss_trades else 0
+    avg_win = returns[wins].mean() if win_count else 0.0
+    avg_loss = returns[losses].mean() if loss_count else 0.0
 
     # 盈亏比
-    total_win = sum([t['return_abs'] for t in win_trades]) if win_trades else 0
-    total_loss = abs(sum([t['return_abs'] for t in loss_trades])) if loss_trades else 0
+    total_win = returns_abs[wins].sum()
+    total_loss = abs(returns_abs[losses].sum())
     profit_factor = total_win / total_loss if total_loss > 0 else 0
 
     # 时间跨度
-    start_date = df.index[0]
-    end_date = df.index[-1]
+    start_date = dates[0]
+    end_date = dates[-1]
     total_days = (end_date - start_date).days
-    trading_days = sum([t['hold_days'] for t in trades])
+    trading_days = int(hold_days.sum())
 
     # 年化收益
     annual_return = _calculate_annual_return(total_return, total_days)
 
     # 最大回撤
-    max_drawdown = _calculate_max_drawdown(equity_curve)
+    max_drawdown = _calculate_max_drawdown(equity_values)
 
     # 夏普比率
-    sharpe_ratio = _calculate_sharpe_ratio(equity_curve)
+    sharpe_ratio = _calculate_sharpe_ratio(equity_values)
 
     # 平均持仓天数
-    avg_hold_days = trading_days / trade_count if trade_count > 0 else 0
+    avg_hold_days = trading_days / trade_count
 
     return {
         'strategy_name': strategy_name,
@@ -264,8 +331,10 @@ def backtest_strategy(
         'total_days': total_days,
         'trading_days': trading_days,
 
-        # 权益曲线
-        'equity_curve': equity_curve
+        # 权益曲线（按列存储，避免逐日构造 (date, value) 元组）
+        'equity_curve': (
+            {'dates': [], 'values': []} if light else {'dates': dates, 'values': equity_values}
+        )
     }
 
 
@@ -292,7 +361,7 @@ def _empty_result(strategy_name: str) -> dict:
         'end_date': None,
         'total_days': 0,
         'trading_days': 0,
-        'equity_curve': []
+        'equity_curve': {'dates': [], 'values': []}
     }
 
 
@@ -350,39 +419,71 @@ def get_pattern(row) -> dict:
     return pattern
 
 
+def _pattern_column(df: pd.DataFrame, col: str) -> np.ndarray:
+    """取指标列为float数组，缺失列视为全NaN"""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[col].to_numpy(dtype=np.float64)
+
+
+def get_patterns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    向量化识别每个交易日的技术形态，结果与逐行调用 get_pattern 一致
+
+    Returns:
+        DataFrame，列为 ma/macd/rsi/volume，指标缺失处为None
+    """
+    ma5, ma20 = _pattern_column(df, 'MA5'), _pattern_column(df, 'MA20')
+    dif, dea = _pattern_column(df, 'DIF'), _pattern_column(df, 'DEA')
+    rsi = _pattern_column(df, 'RSI')
+    vol_ratio = _pattern_column(df, 'VOL_RATIO')
+
+    ma = np.where(ma5 > ma20, "bull", "bear").astype(object)
+    ma[np.isnan(ma5) | np.isnan(ma20)] = None
+
+    macd = np.where(dif > dea, "bull", "bear").astype(object)
+    macd[np.isnan(dif) | np.isnan(dea)] = None
+
+    rsi_state = np.select([rsi < 30, rsi > 70], ["oversold", "overbought"], default="normal").astype(object)
+    rsi_state[np.isnan(rsi)] = None
+
+    volume = np.select([vol_ratio > 1.5, vol_ratio < 0.7], ["high", "low"], default="normal").astype(object)
+    volume[np.isnan(vol_ratio)] = None
+
+    return pd.DataFrame({'ma': ma, 'macd': macd, 'rsi': rsi_state, 'volume': volume}, index=df.index)
+
+
+# 形态描述查找表
+_TREND_DESC = {
+    ("bull", "bull"): "趋势: 多头 (MA5>MA20, DIF>DEA)",
+    ("bull", "bear"): "趋势: 均线多头 (MA5>MA20, DIF<DEA)",
+    ("bear", "bull"): "趋势: MACD多头 (MA5<MA20, DIF>DEA)",
+    ("bear", "bear"): "趋势: 空头 (MA5<MA20, DIF<DEA)",
+}
+_RSI_DESC = {
+    "oversold": "RSI: 超卖区 (<30)",
+    "overbought": "RSI: 超买区 (>70)",
+}
+_VOLUME_DESC = {
+    "high": "成交量: 放量 (量比>1.5)",
+    "low": "成交量: 缩量 (量比<0.7)",
+}
+
+
 def get_pattern_description(pattern: dict) -> list:
     """获取形态的中文描述列表"""
     desc = []
 
     # 均线+MACD组合
-    ma = pattern.get('ma')
-    macd = pattern.get('macd')
-    if ma == "bull" and macd == "bull":
-        desc.append("趋势: 多头 (MA5>MA20, DIF>DEA)")
-    elif ma == "bull" and macd == "bear":
-        desc.append("趋势: 均线多头 (MA5>MA20, DIF<DEA)")
-    elif ma == "bear" and macd == "bull":
-        desc.append("趋势: MACD多头 (MA5<MA20, DIF>DEA)")
-    elif ma == "bear" and macd == "bear":
-        desc.append("趋势: 空头 (MA5<MA20, DIF<DEA)")
+    trend = _TREND_DESC.get((pattern.get('ma'), pattern.get('macd')))
+    if trend:
+        desc.append(trend)
 
     # RSI
-    rsi = pattern.get('rsi')
-    if rsi == "oversold":
-        desc.append("RSI: 超卖区 (<30)")
-    elif rsi == "overbought":
-        desc.append("RSI: 超买区 (>70)")
-    else:
-        desc.append("RSI: 正常区间 (30-70)")
+    desc.append(_RSI_DESC.get(pattern.get('rsi'), "RSI: 正常区间 (30-70)"))
 
     # 成交量
-    vol = pattern.get('volume')
-    if vol == "high":
-        desc.append("成交量: 放量 (量比>1.5)")
-    elif vol == "low":
-        desc.append("成交量: 缩量 (量比<0.7)")
-    else:
-        desc.append("成交量: 正常")
+    desc.append(_VOLUME_DESC.get(pattern.get('volume'), "成交量: 正常"))
 
     return desc
 
@@ -429,52 +530,59 @@ def _generate_legacy_results(strategies: dict, current_pattern: dict) -> dict:
 
 # ==================== 主回测函数 ====================
 
-def backtest_stock(ts_code: str, years: int = 3) -> dict:
+# (信号列, 策略名称)
+_STRATEGY_CONFIGS = (
+    ('signal', 'MA+MACD'),
+    ('signal_boll', 'Bollinger'),
+    ('signal_kdj', 'KDJ'),
+    ('signal_rsi', 'RSI'),
+    ('signal_volume', 'Volume'),
+    ('signal_combined_simple', 'Combined')
+)
+
+
+def backtest_date_range(years: int) -> tuple:
+    """回测所需日线数据的日期范围 (start_date, end_date)，格式YYYYMMDD"""
+    end_date = datetime.now().strftime('%Y%m%d')
+    start_date = (datetime.now() - timedelta(days=365 * years + 30)).strftime('%Y%m%d')
+    return start_date, end_date
+
+
+def backtest_stock(ts_code: str, years: int = 3, df: pd.DataFrame = None, light: bool = False) -> dict:
     """
     对单只股票基于信号进行回测
 
     Args:
         ts_code: 股票代码
         years: 回测年数
+        df: 已获取的日线数据（批量分析时预先读取），默认按回测年数获取
+        light: 只保留各策略汇总统计，不生成逐笔交易记录和权益曲线（只需评分时使用）
 
     Returns:
         回测结果字典 (兼容calc_score和main.py)
     """
     from data import get_stock_data, get_stock_name
-    from indicators import calc_all_indicators
+    from indicators import calc_all_indicators_cached
     from strategy import generate_signals
 
     # 1. 获取数据
-    end_date = datetime.now().strftime('%Y%m%d')
-    start_date = (datetime.now() - timedelta(days=365 * years + 30)).strftime('%Y%m%d')
-
-    df = get_stock_data(ts_code, start_date, end_date)
+    if df is None:
+        start_date, end_date = backtest_date_range(years)
+        df = get_stock_data(ts_code, start_date, end_date)
     if df.empty:
         return None
 
     # 2. 计算指标和信号
-    df = calc_all_indicators(df)
+    df = calc_all_indicators_cached(ts_code, df)
     df = generate_signals(df)
 
     # 转换综合策略信号为简单形式 (2,1 -> 1, -2,-1 -> -1, 0 -> 0)
-    df['signal_combined_simple'] = 0
-    df.loc[df['signal_combined'] >= 1, 'signal_combined_simple'] = 1
-    df.loc[df['signal_combined'] <= -1, 'signal_combined_simple'] = -1
+    sc = df['signal_combined'].to_numpy()
+    # generate_signals 输出的信号列已是int8，回测时提取信号矩阵无需再转换
+    df['signal_combined_simple'] = np.where(sc >= 1, 1, np.where(sc <= -1, -1, 0)).astype(np.int8)
 
     # 3. 回测所有策略
-    strategies = {}
-    strategy_configs = [
-        ('signal', 'MA+MACD'),
-        ('signal_boll', 'Bollinger'),
-        ('signal_kdj', 'KDJ'),
-        ('signal_rsi', 'RSI'),
-        ('signal_volume', 'Volume'),
-        ('signal_combined_simple', 'Combined')
-    ]
-
-    for signal_col, strategy_name in strategy_configs:
-        result = backtest_strategy(df, signal_col, strategy_name)
-        strategies[strategy_name] = result
+    strategies = backtest_all_strategies(df, _STRATEGY_CONFIGS, light=light)
 
     # 4. 获取当前状态（兼容calc_score）
     latest = df.iloc[-1]
@@ -511,8 +619,152 @@ def backtest_stock(ts_code: str, years: int = 3) -> dict:
     }
 
 
+def warmup(batch: bool = False):
+    """
+    用一小段合成K线按分析流程（指标 -> 信号 -> 回测）跑一遍，编译沿途用到的所有 numba 内核
+
+    内核都带 cache=True，构建部署镜像时调用一次即可把编译结果写入 __pycache__，
+    之后每个进程首次分析只需加载缓存，无需等待JIT。
+
+    Args:
+        batch: 是否同时编译 generate_signals_batch 使用的并行内核（单股分析不使用）
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    from indicators import calc_all_indicators
+    from strategy import generate_signals, warmup as warmup_signals
+
+    # 周期波动的价格，保证各策略都出现买卖信号、持仓扫描内核会被调用
+    n = 120
+    close = 10 * (1 + 0.1 * np.sin(np.arange(n) / 6))
+    vol = np.where(np.arange(n) % 7 == 0, 4e5, 1e5)
+    df = pd.DataFrame({
+        'open': close, 'high': close * 1.01, 'low': close * 0.99,
+        'close': close, 'vol': vol, 'amount': close * vol
+    }, index=pd.bdate_range('2024-01-02', periods=n, name='trade_date'))
+
+    signals = generate_signals(calc_all_indicators(df))
+    sc = signals['signal_combined'].to_numpy()
+    signals['signal_combined_simple'] = np.where(sc >= 1, 1, np.where(sc <= -1, -1, 0)).astype(np.int8)
+    backtest_all_strategies(signals, _STRATEGY_CONFIGS)
+
+    # 数据有缺失时指标逐项计算，KDJ 走单独的递推内核
+    df.iloc[0, df.columns.get_loc('close')] = np.nan
+    calc_all_indicators(df)
+
+    if batch:
+        warmup_signals(batch=True)
+
+
+# ==================== 回测结果缓存 ====================
+
+BACKTEST_CACHE_DIR = os.path.join(CACHE_DIR, 'backtest')
+BACKTEST_CACHE_KEEP_DAYS = 7  # 缓存文件保留天数
+
+
+def _backtest_cache_path(ts_code: str, years: int, light: bool = False) -> str:
+    """回测结果缓存文件路径（按交易日区分，数据每天最多更新一次；精简结果单独缓存）"""
+    day = datetime.now().strftime('%Y%m%d')
+    suffix = '_light' if light else ''
+    return os.path.join(BACKTEST_CACHE_DIR, f"bt_{ts_code}_{years}y{suffix}_{day}.pkl")
+
+
+def backtest_stock_cached(ts_code: str, years: int = 3, df: pd.DataFrame = None, light: bool = False) -> dict:
+    """
+    带磁盘缓存的 backtest_stock，同一天重复分析时直接读取缓存结果
+
+    Args:
+        ts_code: 股票代码
+        years: 回测年数
+        df: 已获取的日线数据，未命中缓存时使用
+        light: 只保留各策略汇总统计
+
+    Returns:
+        回测结果字典，与 backtest_stock 相同
+    """
+    path = _backtest_cache_path(ts_code, years, light)
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass  # 缓存损坏则重新回测
+
+    result = backtest_stock(ts_code, years, df, light)
+    if result:
+        os.makedirs(BACKTEST_CACHE_DIR, exist_ok=True)
+        # 先写临时文件再替换，避免多进程同时读到写了一半的文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    return result
+
+
+def cleanup_backtest_cache(keep_days: int = BACKTEST_CACHE_KEEP_DAYS):
+    """删除超过保留天数的回测结果缓存文件"""
+    cutoff = time.time() - keep_days * 86400
+    for path in glob.glob(os.path.join(BACKTEST_CACHE_DIR, 'bt_*.pkl')):
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
 # ==================== 评分系统 ====================
 
+# 评分查找表：区间边界 + 各区间对应分数（bisect定位区间，代替if/elif链）
+_TREND_SCORES = {
+    ('bull', 'bull'): (30, "多头趋势"),
+    ('bull', 'bear'): (20, "均线多头"),
+    ('bear', 'bull'): (15, "MACD多头"),
+}
+_TREND_DEFAULT = (5, "空头趋势")
+
+# 左闭右开区间：<30, <50, <70, 其余
+_RSI_BOUNDS = (30, 50, 70)
+_RSI_SCORES = ((16, "超卖"), (20, "低位"), (14, "中位"), (6, "超买"))
+
+# 左闭右开区间：<0.7, <1.5, <2.5, 其余
+_VOLUME_BOUNDS = (0.7, 1.5, 2.5)
+_VOLUME_SCORES = ((5, "缩量"), (10, "正常"), (8, "放量"), (4, "异常"))
+
+# 胜率 >=65, >=55, >=50, >=40
+_WINRATE_BOUNDS = (40, 50, 55, 65)
+_WINRATE_SCORES = (4, 8, 12, 16, 20)
+
+# 年化收益 >30, >15, >5, >0
+_RETURN_BOUNDS = (0, 5, 15, 30)
+_RETURN_SCORES = (0, 4, 6, 8, 10)
+
+# 夏普比率 >2, >1, >0.5, >0
+_SHARPE_BOUNDS = (0, 0.5, 1, 2)
+_SHARPE_SCORES = (0, 4, 6, 8, 10)
+
+_SIGNAL_SCORES = {
+    2: (20, "强烈买入信号"),
+    1: (15, "买入信号"),
+    0: (5, "观望信号"),
+    -1: (0, "卖出信号"),
+}
+_SIGNAL_DEFAULT = (0, "强烈卖出信号")
+
+# 评级：总分 >=80, >=65, >=50, >=35 及以下，按是否有买入信号区分
+_GRADE_BOUNDS = (35, 50, 65, 80)
+_GRADES_NO_SIGNAL = (
+    ('E', '不建议买入', 'avoid'),
+    ('D', '观望为主', 'wait'),
+    ('C', '观望为主', 'wait'),
+    ('C', '当前无买入信号，观望为主', 'wait'),
+    ('B', '历史表现好，但当前无买入信号，建议观望', 'wait'),
+)
+_GRADES_BUY_SIGNAL = (
+    ('E', '不建议买入', 'avoid'),
+    ('D', '观望为主', 'wait'),
+    ('C', '谨慎买入，控制仓位', 'hold'),
+    ('B', '可以买入', 'buy'),
+    ('A', '强烈推荐买入', 'buy'),
+)
+
+
 def calc_score(result: dict) -> dict:
     """
     计算综合买入评分 (0-100)
@@ -539,53 +791,24 @@ def calc_score(result: dict) -> dict:
     scores = {}
 
     # 1. 趋势分 (30分)
-    ma = pattern.get('ma')
-    macd = pattern.get('macd')
-    if ma == 'bull' and macd == 'bull':
-        scores['trend'] = 30
-        scores['trend_text'] = "多头趋势"
-    elif ma == 'bull' and macd == 'bear':
-        scores['trend'] = 20
-        scores['trend_text'] = "均线多头"
-    elif ma == 'bear' and macd == 'bull':
-        scores['trend'] = 15
-        scores['trend_text'] = "MACD多头"
-    else:
-        scores['trend'] = 5
-        scores['trend_text'] = "空头趋势"
+    scores['trend'], scores['trend_text'] = _TREND_SCORES.get(
+        (pattern.get('ma'), pattern.get('macd')), _TREND_DEFAULT
+    )
 
     # 2. RSI分 (20分)
     if rsi is not None:
-        if rsi < 30:
-            scores['rsi'] = 16
-            scores['rsi_text'] = f"超卖({rsi:.0f})"
-        elif rsi < 50:
-            scores['rsi'] = 20
-            scores['rsi_text'] = f"低位({rsi:.0f})"
-        elif rsi < 70:
-            scores['rsi'] = 14
-            scores['rsi_text'] = f"中位({rsi:.0f})"
-        else:
-            scores['rsi'] = 6
-            scores['rsi_text'] = f"超买({rsi:.0f})"
+        score, label = _RSI_SCORES[bisect_right(_RSI_BOUNDS, rsi)]
+        scores['rsi'] = score
+        scores['rsi_text'] = f"{label}({rsi:.0f})"
     else:
         scores['rsi'] = 10
         scores['rsi_text'] = "无数据"
 
     # 3. 成交量分 (10分)
     if vol_ratio is not None:
-        if vol_ratio < 0.7:
-            scores['volume'] = 5
-            scores['volume_text'] = f"缩量({vol_ratio:.1f})"
-        elif vol_ratio < 1.5:
-            scores['volume'] = 10
-            scores['volume_text'] = f"正常({vol_ratio:.1f})"
-        elif vol_ratio < 2.5:
-            scores['volume'] = 8
-            scores['volume_text'] = f"放量({vol_ratio:.1f})"
-        else:
-            scores['volume'] = 4
-            scores['volume_text'] = f"异常({vol_ratio:.1f})"
+        score, label = _VOLUME_SCORES[bisect_right(_VOLUME_BOUNDS, vol_ratio)]
+        scores['volume'] = score
+        scores['volume_text'] = f"{label}({vol_ratio:.1f})"
     else:
         scores['volume'] = 5
         scores['volume_text'] = "无数据"
@@ -600,42 +823,15 @@ def calc_score(result: dict) -> dict:
 
             # 4.1 胜率分 (20分)
             win_rate = best_strategy.get('win_rate', 0)
-            if win_rate >= 65:
-                scores['strategy_winrate'] = 20
-            elif win_rate >= 55:
-                scores['strategy_winrate'] = 16
-            elif win_rate >= 50:
-                scores['strategy_winrate'] = 12
-            elif win_rate >= 40:
-                scores['strategy_winrate'] = 8
-            else:
-                scores['strategy_winrate'] = 4
+            scores['strategy_winrate'] = _WINRATE_SCORES[bisect_right(_WINRATE_BOUNDS, win_rate)]
 
             # 4.2 收益率分 (10分)
             annual_return = best_strategy.get('annual_return', 0)
-            if annual_return > 30:
-                scores['strategy_return'] = 10
-            elif annual_return > 15:
-                scores['strategy_return'] = 8
-            elif annual_return > 5:
-                scores['strategy_return'] = 6
-            elif annual_return > 0:
-                scores['strategy_return'] = 4
-            else:
-                scores['strategy_return'] = 0
+            scores['strategy_return'] = _RETURN_SCORES[bisect_left(_RETURN_BOUNDS, annual_return)]
 
             # 4.3 夏普比率分 (10分)
             sharpe = best_strategy.get('sharpe_ratio', 0)
-            if sharpe > 2:
-                scores['strategy_sharpe'] = 10
-            elif sharpe > 1:
-                scores['strategy_sharpe'] = 8
-            elif sharpe > 0.5:
-                scores['strategy_sharpe'] = 6
-            elif sharpe > 0:
-                scores['strategy_sharpe'] = 4
-            else:
-                scores['strategy_sharpe'] = 0
+            scores['strategy_sharpe'] = _SHARPE_SCORES[bisect_left(_SHARPE_BOUNDS, sharpe)]
 
             scores['strategy_text'] = f"{best_strategy['strategy_name']}: 胜率{win_rate:.0f}%/年化{annual_return:+.1f}%/SR{sharpe:.1f}"
             scores['best_strategy'] = best_strategy['strategy_name']
@@ -655,22 +851,7 @@ def calc_score(result: dict) -> dict:
     # 5. 当前信号分 (20分) - 新增
     current_signals = result.get('current_signals', {})
     signal_combined = current_signals.get('signal_combined', 0)
-
-    if signal_combined == 2:  # 强烈买入
-        scores['signal'] = 20
-        scores['signal_text'] = "强烈买入信号"
-    elif signal_combined == 1:  # 买入
-        scores['signal'] = 15
-        scores['signal_text'] = "买入信号"
-    elif signal_combined == 0:  # 观望
-        scores['signal'] = 5
-        scores['signal_text'] = "观望信号"
-    elif signal_combined == -1:  # 卖出
-        scores['signal'] = 0
-        scores['signal_text'] = "卖出信号"
-    else:  # 强烈卖出
-        scores['signal'] = 0
-        scores['signal_text'] = "强烈卖出信号"
+    scores['signal'], scores['signal_text'] = _SIGNAL_SCORES.get(signal_combined, _SIGNAL_DEFAULT)
 
     # 总分 (满分120，归一化到100)
     raw_total = (scores['trend'] + scores['rsi'] + scores['volume'] +
@@ -683,51 +864,9 @@ def calc_score(result: dict) -> dict:
     scores['total'] = min(100, int(raw_total * 100 / 120))
 
     # 评级 - 同时考虑分数和当前信号
-    total = scores['total']
-
     # 当综合信号是卖出或观望时，降级处理
-    if signal_combined <= 0:  # 观望或卖出
-        if total >= 80:
-            scores['grade'] = 'B'
-            scores['advice'] = '历史表现好，但当前无买入信号，建议观望'
-            scores['action'] = 'wait'
-        elif total >= 65:
-            scores['grade'] = 'C'
-            scores['advice'] = '当前无买入信号，观望为主'
-            scores['action'] = 'wait'
-        elif total >= 50:
-            scores['grade'] = 'C'
-            scores['advice'] = '观望为主'
-            scores['action'] = 'wait'
-        elif total >= 35:
-            scores['grade'] = 'D'
-            scores['advice'] = '观望为主'
-            scores['action'] = 'wait'
-        else:
-            scores['grade'] = 'E'
-            scores['advice'] = '不建议买入'
-            scores['action'] = 'avoid'
-    else:  # 有买入信号
-        if total >= 80:
-            scores['grade'] = 'A'
-            scores['advice'] = '强烈推荐买入'
-            scores['action'] = 'buy'
-        elif total >= 65:
-            scores['grade'] = 'B'
-            scores['advice'] = '可以买入'
-            scores['action'] = 'buy'
-        elif total >= 50:
-            scores['grade'] = 'C'
-            scores['advice'] = '谨慎买入，控制仓位'
-            scores['action'] = 'hold'
-        elif total >= 35:
-            scores['grade'] = 'D'
-            scores['advice'] = '观望为主'
-            scores['action'] = 'wait'
-        else:
-            scores['grade'] = 'E'
-            scores['advice'] = '不建议买入'
-            scores['action'] = 'avoid'
+    grades = _GRADES_NO_SIGNAL if signal_combined <= 0 else _GRADES_BUY_SIGNAL
+    scores['grade'], scores['advice'], scores['action'] = grades[bisect_right(_GRADE_BOUNDS, scores['total'])]
 
     return scores
 
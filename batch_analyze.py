@@ -3,125 +3,186 @@
 批量股票分析脚本
 分析多只股票的最佳策略，筛选出买点机会
 """
+import io
+import os
 import sys
+import multiprocessing
+from contextlib import redirect_stdout
 from datetime import datetime
-from data import get_stock_data, get_stock_name, get_latest_price
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import TUSHARE_TOKENS
+from data import get_stock_data_bulk, get_latest_price, use_token
 from indicators import calc_all_indicators
-from backtest import backtest_stock, calc_score
+from backtest import backtest_stock_cached, backtest_date_range, cleanup_backtest_cache, calc_score
 
 
-def analyze_batch(stock_codes):
+def _init_worker(counter):
+    """子进程初始化：配置了多个token时按进程序号轮流分配"""
+    with counter.get_lock():
+        worker_id = counter.value
+        counter.value += 1
+    use_token(TUSHARE_TOKENS[worker_id % len(TUSHARE_TOKENS)])
+
+
+def _analyze_one(code, df=None):
     """
-    批量分析股票
+    分析单只股票（在子进程中执行），子进程内的输出先写入缓冲区，随结果一起交给主进程打印
 
     Args:
-        stock_codes: 股票代码列表
+        code: 股票代码
+        df: 预先批量读取的日线数据，为None时由子进程自行获取
 
     Returns:
-        分析结果列表
+        (分析结果字典或None, 状态说明)
     """
-    results = []
-
-    for i, code in enumerate(stock_codes, 1):
-        print(f"\n[{i}/{len(stock_codes)}] 分析 {code}...")
-
-        try:
-            # 回测分析
-            result = backtest_stock(code, years=3)
-
-            if not result or not result.get('strategies'):
-                print(f"  ❌ {code} 数据不足")
-                continue
-
-            # 获取最佳策略
-            strategies = result.get('strategies', {})
-            valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
-
-            if not valid_strategies:
-                print(f"  ❌ {code} 无有效策略")
-                continue
-
-            best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0))
-
-            # 获取当前信号
-            current_signals = result.get('current_signals', {})
-
-            # 计算综合评分
-            scores = calc_score(result)
-
-            # 获取最新价格
-            latest = get_latest_price(code)
-            current_price = latest['close'] if latest else 0
-
-            # 判断是否在买点
-            is_buy_point = False
-            buy_reason = []
-
-            # 判断标准1: 最佳策略当前给出买入信号
-            best_strategy_name = best_strategy['strategy_name']
-            signal_map = {
-                'MA+MACD': 'signal',
-                'Bollinger': 'signal_boll',
-                'KDJ': 'signal_kdj',
-                'RSI': 'signal_rsi',
-                'Volume': 'signal_volume',
-                'Combined': 'signal_combined'
-            }
-
-            best_signal_key = signal_map.get(best_strategy_name)
-            if best_signal_key:
-                best_signal = current_signals.get(best_signal_key, 0)
-                if best_signal >= 1:
-                    is_buy_point = True
-                    buy_reason.append(f"最佳策略{best_strategy_name}买入信号")
-
-            # 判断标准2: 综合策略买入
-            combined_signal = current_signals.get('signal_combined', 0)
-            if combined_signal >= 1:
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        item, message = _analyze_stock(code, df)
+    output = buf.getvalue()
+    if output:
+        message = output.rstrip('\n').replace('\n', '\n  ') + '\n  ' + message
+    return item, message
+
+
+def _analyze_stock(code, df=None):
+    """分析单只股票，返回 (分析结果字典或None, 状态说明)"""
+    try:
+        # 回测分析（同一天内重复运行直接读取缓存）
+        result = backtest_stock_cached(code, years=3, df=df, light=True)
+
+        if not result or not result.get('strategies'):
+            return None, f"❌ {code} 数据不足"
+
+        # 获取最佳策略
+        strategies = result.get('strategies', {})
+        valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
+
+        if not valid_strategies:
+            return None, f"❌ {code} 无有效策略"
+
+        best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0))
+
+        # 获取当前信号
+        current_signals = result.get('current_signals', {})
+
+        # 计算综合评分
+        scores = calc_score(result)
+
+        # 获取最新价格
+        latest = get_latest_price(code, df)
+        current_price = latest['close'] if latest else 0
+
+        # 判断是否在买点
+        is_buy_point = False
+        buy_reason = []
+
+        # 判断标准1: 最佳策略当前给出买入信号
+        best_strategy_name = best_strategy['strategy_name']
+        signal_map = {
+            'MA+MACD': 'signal',
+            'Bollinger': 'signal_boll',
+            'KDJ': 'signal_kdj',
+            'RSI': 'signal_rsi',
+            'Volume': 'signal_volume',
+            'Combined': 'signal_combined'
+        }
+
+        best_signal_key = signal_map.get(best_strategy_name)
+        if best_signal_key:
+            best_signal = current_signals.get(best_signal_key, 0)
+            if best_signal >= 1:
                 is_buy_point = True
-                buy_reason.append(f"综合策略买入(评分{current_signals.get('score_combined', 0):.0f})")
+                buy_reason.append(f"最佳策略{best_strategy_name}买入信号")
+
+        # 判断标准2: 综合策略买入
+        combined_signal = current_signals.get('signal_combined', 0)
+        if combined_signal >= 1:
+            is_buy_point = True
+            buy_reason.append(f"综合策略买入(评分{current_signals.get('score_combined', 0):.0f})")
+
+        # 判断标准3: RSI超卖且RSI策略胜率高
+        current_rsi = result.get('current_rsi')
+        rsi_strategy = strategies.get('RSI', {})
+        if current_rsi and current_rsi < 30 and rsi_strategy.get('win_rate', 0) >= 60:
+            is_buy_point = True
+            buy_reason.append(f"RSI超卖({current_rsi:.0f}),历史胜率{rsi_strategy['win_rate']:.0f}%")
+
+        # 判断标准4: 综合评分高且接近买点
+        if scores and scores['total'] >= 65 and combined_signal == 0:
+            # B级以上，虽然没有明确买入信号，但可以关注
+            buy_reason.append(f"综合评分{scores['total']}分({scores['grade']}级),可关注")
+
+        item = {
+            'code': code,
+            'name': result['name'],
+            'price': current_price,
+            'best_strategy': best_strategy_name,
+            'best_return': best_strategy['annual_return'],
+            'best_winrate': best_strategy['win_rate'],
+            'best_sharpe': best_strategy['sharpe_ratio'],
+            'current_rsi': current_rsi,
+            'score': scores['total'] if scores else 0,
+            'grade': scores['grade'] if scores else 'N/A',
+            'is_buy_point': is_buy_point,
+            'buy_reason': ', '.join(buy_reason) if buy_reason else '观望',
+            'combined_signal': combined_signal,
+            'best_signal': best_signal if best_signal_key else 0
+        }
+
+        status = "🔥 买点" if is_buy_point else "⏸️  观望"
+        return item, f"{status} | 最佳:{best_strategy_name} | 评分:{scores['total'] if scores else 0}分 | 价格:{current_price:.2f}元"
+
+    except Exception as e:
+        return None, f"❌ {code} 分析失败: {e}"
+
+
+def analyze_batch(stock_codes, max_workers=None):
+    """
+    批量分析股票（多进程并行，每只股票的回测相互独立）
 
-            # 判断标准3: RSI超卖且RSI策略胜率高
-            current_rsi = result.get('current_rsi')
-            rsi_strategy = strategies.get('RSI', {})
-            if current_rsi and current_rsi < 30 and rsi_strategy.get('win_rate', 0) >= 60:
-                is_buy_point = True
-                buy_reason.append(f"RSI超卖({current_rsi:.0f}),历史胜率{rsi_strategy['win_rate']:.0f}%")
-
-            # 判断标准4: 综合评分高且接近买点
-            if scores and scores['total'] >= 65 and combined_signal == 0:
-                # B级以上，虽然没有明确买入信号，但可以关注
-                buy_reason.append(f"综合评分{scores['total']}分({scores['grade']}级),可关注")
-
-            results.append({
-                'code': code,
-                'name': result['name'],
-                'price': current_price,
-                'best_strategy': best_strategy_name,
-                'best_return': best_strategy['annual_return'],
-                'best_winrate': best_strategy['win_rate'],
-                'best_sharpe': best_strategy['sharpe_ratio'],
-                'current_rsi': current_rsi,
-                'score': scores['total'] if scores else 0,
-                'grade': scores['grade'] if scores else 'N/A',
-                'is_buy_point': is_buy_point,
-                'buy_reason': ', '.join(buy_reason) if buy_reason else '观望',
-                'combined_signal': combined_signal,
-                'best_signal': best_signal if best_signal_key else 0
-            })
-
-            status = "🔥 买点" if is_buy_point else "⏸️  观望"
-            print(f"  {status} | 最佳:{best_strategy_name} | 评分:{scores['total'] if scores else 0}分 | 价格:{current_price:.2f}元")
-
-        except Exception as e:
-            print(f"  ❌ {code} 分析失败: {e}")
-            continue
-
-    return results
+    Args:
+        stock_codes: 股票代码列表
+        max_workers: 进程数，默认CPU核数
+
+    Returns:
+        分析结果列表（保持输入顺序）
+    """
+    results = [None] * len(stock_codes)
+
+    # 日线缓存已是最新的股票一次查询批量读取，其余由子进程并行从tushare更新
+    start_date, end_date = backtest_date_range(3)
+    df_map = get_stock_data_bulk(stock_codes, start_date, end_date, update=False)
+
+    pool_kwargs = {}
+    if len(TUSHARE_TOKENS) > 1:
+        pool_kwargs = {'initializer': _init_worker, 'initargs': (multiprocessing.Value('i', 0),)}
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), **pool_kwargs) as executor:
+        futures = {
+            executor.submit(_analyze_one, code, df_map.get(code)): i
+            for i, code in enumerate(stock_codes)
+        }
+
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            item, message = future.result()
+            print(f"\n[{done}/{len(stock_codes)}] {stock_codes[i]}\n  {message}")
+            results[i] = item
+
+    return [r for r in results if r]
 
 
 def print_report(results):
-    """打印分析报告"""
+    """打印分析报告（先写入缓冲区，最后一次性输出）"""
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        _print_report(results)
+    sys.stdout.write(buf.getvalue())
+    sys.stdout.flush()
+
+
+def _print_report(results):
+    """生成分析报告内容"""
 
     # 筛选买点股票
     buy_points = [r for r in results if r['is_buy_point']]
@@ -237,6 +298,7 @@ def main():
     print(f"{'='*100}")
 
     # 执行批量分析
+    cleanup_backtest_cache()
     results = analyze_batch(stock_codes)
 
     # 打印报告
@@ -1,12 +1,29 @@
+import os
+from dotenv import load_dotenv
+
+# 从 .env 读取环境变量（已设置的环境变量优先）
+load_dotenv()
+
 # Tushare 配置
-# 请将下面的 token 替换为你自己的 tushare pro token
+# 通过环境变量 TUSHARE_TOKEN 设置你自己的 tushare pro token
 # 获取地址: https://tushare.pro/user/token
+TUSHARE_TOKEN = os.getenv('TUSHARE_TOKEN', '')
 
-TUSHARE_TOKEN = "4a4e624c1eb4b0f92f9d41426caf0ad5bd7ff8a2bbe7385f4863e8b3"
+# 多个token（逗号分隔），批量分析时各进程轮流使用以分摊频率限制
+TUSHARE_TOKENS = [t for t in os.getenv('TUSHARE_TOKENS', '').split(',') if t] or [TUSHARE_TOKEN]
 
 # 数据缓存配置
 CACHE_DIR = "cache"
 DB_PATH = "cache/stock_data.db"
 
+# Redis 配置（可选，不可用时自动回退到SQLite）
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+REDIS_DB = int(os.getenv('REDIS_DB', 0))
+
+# 反向代理配置：仅在应用只能经Nginx访问时设为1，
+# 此时由ProxyFix从最后一跳X-Forwarded-For取客户端IP（直连时该头可被伪造）
+TRUST_PROXY = os.getenv('TRUST_PROXY', '0') == '1'
+
 # 回测配置
 BACKTEST_PERIODS = [5, 10, 20, 60, 120, 250]  # 5日、10日、20日、3月、6月、12月
@@ -3,37 +3,136 @@
 使用 tushare 获取A股日线数据，SQLite 缓存避免重复请求
 """
 import os
+import atexit
 import sqlite3
+import threading
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 import tushare as ts
 from config import TUSHARE_TOKEN, CACHE_DIR, DB_PATH
 
+pro = None
+
+
+def use_token(token: str):
+    """使用指定token初始化 tushare 接口（token为空时使用本机 ts.set_token 保存的凭证）"""
+    global pro
+    try:
+        pro = ts.pro_api(token)
+    except Exception as e:
+        pro = None
+        print(f"tushare 初始化失败，请设置 TUSHARE_TOKEN: {e}")
+
+
 # 初始化 tushare
-ts.set_token(TUSHARE_TOKEN)
-pro = ts.pro_api()
+use_token(TUSHARE_TOKEN)
+
+
+# 日线数据列（与 daily_data 表字段顺序一致）
+DAILY_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'vol', 'amount']
+
+
+def _connect() -> sqlite3.Connection:
+    """打开缓存数据库连接（连接级 PRAGMA 每个连接都要设置）"""
+    conn = sqlite3.connect(DB_PATH)
+    # WAL模式下 NORMAL 同步级别已能保证一致性，避免每次提交都 fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")  # 64MB 页缓存
+    return conn
+
+
+# 每个线程复用一个数据库连接；记录进程号，fork出的子进程不复用父进程的连接
+_local = threading.local()
+_db_ready = False
+_db_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """获取当前线程的缓存数据库连接，首次使用时建表"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        _ensure_db()
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _ensure_db():
+    """每个进程只执行一次 init_db"""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if not _db_ready:
+            init_db()
+            _db_ready = True
+
+
+@atexit.register
+def _close_conn():
+    """退出时关闭主线程的数据库连接"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.execute("PRAGMA optimize")  # 按需更新查询规划器的统计信息
+        conn.close()
+        _local.conn = None
+
+
+DAILY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        ts_code TEXT,
+        trade_date TEXT,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        vol REAL,
+        amount REAL,
+        PRIMARY KEY (ts_code, trade_date)
+    ) WITHOUT ROWID
+"""
+
+
+def _migrate_daily_data(conn):
+    """旧版 daily_data 为普通 rowid 表时，一次性迁移为 WITHOUT ROWID 表"""
+    def needs_migration():
+        rows = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'daily_data'").fetchall()
+        return bool(rows) and 'WITHOUT ROWID' not in rows[0][0].upper()
+
+    if not needs_migration():
+        return
+
+    # 加写锁后再检查一次，避免多个进程同时迁移
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if needs_migration():
+            print("迁移日线缓存表...")
+            conn.execute(DAILY_TABLE_SQL.format(name='daily_data_new'))
+            conn.execute("INSERT INTO daily_data_new SELECT * FROM daily_data")
+            conn.execute("DROP TABLE daily_data")
+            conn.execute("ALTER TABLE daily_data_new RENAME TO daily_data")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("ANALYZE daily_data")
 
 
 def init_db():
     """初始化数据库表"""
     os.makedirs(CACHE_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
 
-    # 日线数据表
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily_data (
-            ts_code TEXT,
-            trade_date TEXT,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL,
-            vol REAL,
-            amount REAL,
-            PRIMARY KEY (ts_code, trade_date)
-        )
-    """)
+    # WAL模式：批量分析多进程并发读写同一缓存库（持久化到数据库文件，设置一次即可）
+    cursor.execute("PRAGMA journal_mode=WAL").fetchall()
+
+    # 日线数据表（WITHOUT ROWID：按主键聚簇存储，按股票+日期范围查询时直接扫描主键B树，无需回表）
+    _migrate_daily_data(conn)
+    cursor.execute(DAILY_TABLE_SQL.format(name='daily_data'))
 
     # 股票基本信息表
     cursor.execute("""
@@ -61,14 +160,12 @@ def init_db():
 
 def get_stock_name(ts_code: str) -> str:
     """获取股票名称"""
-    init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = _get_conn()
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM stock_info WHERE ts_code = ?", (ts_code,))
     result = cursor.fetchone()
 
     if result:
-        conn.close()
         return result[0]
 
     # 从 tushare 获取
@@ -81,84 +178,202 @@ def get_stock_name(ts_code: str) -> str:
                 (row['ts_code'], row['name'], row.get('industry', ''), row.get('list_date', ''))
             )
             conn.commit()
-            conn.close()
             return row['name']
     except Exception as e:
         print(f"获取股票信息失败: {e}")
 
-    conn.close()
     return ts_code
 
 
-def get_stock_data(ts_code: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+def get_stock_names(codes: list) -> dict:
     """
-    获取股票日线数据(后复权)
+    批量获取股票名称：一次查询读取缓存，缺失的一次性从 tushare 获取
 
     Args:
-        ts_code: 股票代码，如 '000001.SZ'
-        start_date: 开始日期 YYYYMMDD，默认3年前
-        end_date: 结束日期 YYYYMMDD，默认今天
+        codes: 股票代码列表
 
     Returns:
-        DataFrame: 包含 trade_date, open, high, low, close, vol 等列
+        {股票代码: 名称}，获取失败的股票名称为代码本身
     """
-    init_db()
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+
+    conn = _get_conn()
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(codes))
+    cursor.execute(f"SELECT ts_code, name FROM stock_info WHERE ts_code IN ({placeholders})", codes)
+    names = dict(cursor.fetchall())
+
+    missing = [code for code in codes if code not in names]
+    if missing:
+        try:
+            df = pro.stock_basic(ts_code=','.join(missing), fields='ts_code,name,industry,list_date')
+            if df is not None and not df.empty:
+                df = df.reindex(columns=['ts_code', 'name', 'industry', 'list_date']).fillna('')
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO stock_info VALUES (?, ?, ?, ?)",
+                        df.itertuples(index=False, name=None)
+                    )
+                names.update(zip(df['ts_code'], df['name']))
+        except Exception as e:
+            print(f"获取股票信息失败: {e}")
+
+    return {code: names.get(code, code) for code in codes}
 
-    # 默认日期范围：3年
+
+def _default_date_range(start_date: str = None, end_date: str = None) -> tuple:
+    """默认日期范围：3年"""
     if end_date is None:
         end_date = datetime.now().strftime('%Y%m%d')
     if start_date is None:
         start_date = (datetime.now() - timedelta(days=365*3+30)).strftime('%Y%m%d')
+    return start_date, end_date
+
+
+def _is_cache_fresh(meta, start_date: str, end_date: str) -> bool:
+    """缓存是否覆盖请求范围且今天已更新"""
+    if not meta:
+        return False
+    cached_start, cached_end, last_update = meta
+    return (cached_start <= start_date and cached_end >= end_date
+            and last_update == datetime.now().strftime('%Y%m%d'))
+
+
+def _fetch_daily(ts_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """从 tushare 获取前复权日线数据（最新价=实际价格）"""
+    return ts.pro_bar(
+        ts_code=ts_code,
+        api=pro,
+        start_date=start_date,
+        end_date=end_date,
+        adj='qfq'  # 前复权
+    )
+
+
+def _same_adjustment(conn, ts_code: str, df: pd.DataFrame) -> bool:
+    """新获取的数据与缓存重叠的交易日收盘价是否一致（不一致说明除权除息后前复权价格整体变化）"""
+    dates = df['trade_date'].tolist()
+    placeholders = ','.join('?' * len(dates))
+    cached = dict(conn.execute(
+        f"SELECT trade_date, close FROM daily_data WHERE ts_code = ? AND trade_date IN ({placeholders})",
+        (ts_code, *dates)
+    ).fetchall())
+    if not cached:
+        return False
+    fetched = df.set_index('trade_date')['close']
+    return all(np.isclose(fetched[date], close) for date, close in cached.items())
+
+
+def _update_cache(conn, ts_code: str, start_date: str, end_date: str):
+    """
+    缓存过期时从 tushare 获取数据并写入缓存
 
-    # 检查缓存
-    conn = sqlite3.connect(DB_PATH)
-
-    # 查询缓存的数据范围
+    已缓存请求起始日之后的数据时只增量获取缓存最后一个交易日之后的数据；
+    缓存最后一个交易日会重新获取，用于校验复权价格，发生除权除息时重新获取完整区间
+    """
     cursor = conn.cursor()
     cursor.execute("SELECT start_date, end_date, last_update FROM cache_meta WHERE ts_code = ?", (ts_code,))
     meta = cursor.fetchone()
-
-    need_update = True
-    if meta:
-        cached_start, cached_end, last_update = meta
-        last_update_date = datetime.strptime(last_update, '%Y%m%d')
-        # 如果缓存覆盖请求范围且今天已更新，直接用缓存
-        if cached_start <= start_date and cached_end >= end_date:
-            if last_update == datetime.now().strftime('%Y%m%d'):
-                need_update = False
-
-    if need_update:
-        print(f"从 tushare 获取 {ts_code} 数据...")
-        try:
-            # 获取前复权日线数据（最新价=实际价格）
-            df = ts.pro_bar(
-                ts_code=ts_code,
-                start_date=start_date,
-                end_date=end_date,
-                adj='qfq'  # 前复权
-            )
-
-            if df is not None and not df.empty:
-                # 存入数据库
-                for _, row in df.iterrows():
-                    cursor.execute("""
+    if _is_cache_fresh(meta, start_date, end_date):
+        return
+
+    # 增量更新的起点：缓存中最后一个交易日
+    fetch_start = start_date
+    meta_start = start_date
+    if meta and meta[0] <= start_date <= meta[1]:
+        cursor.execute("SELECT MAX(trade_date) FROM daily_data WHERE ts_code = ?", (ts_code,))
+        last_cached = cursor.fetchone()[0]
+        if last_cached and last_cached >= start_date:
+            fetch_start = min(last_cached, end_date)
+            meta_start = meta[0]
+
+    print(f"从 tushare 获取 {ts_code} 数据...")
+    try:
+        df = _fetch_daily(ts_code, fetch_start, end_date)
+
+        incremental = fetch_start != start_date
+        if incremental and df is not None and not df.empty and not _same_adjustment(conn, ts_code, df):
+            print("复权价格已变化，重新获取完整数据...")
+            incremental = False
+            meta_start = start_date
+            df = _fetch_daily(ts_code, start_date, end_date)
+
+        # 增量获取没有新数据（如非交易日）时也记录本次更新
+        if df is not None and (incremental or not df.empty):
+            # 存入数据库：单个事务内批量写入，只提交一次
+            with conn:
+                if not df.empty:
+                    conn.executemany("""
                         INSERT OR REPLACE INTO daily_data
                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        row['ts_code'], row['trade_date'],
-                        row['open'], row['high'], row['low'], row['close'],
-                        row['vol'], row['amount']
-                    ))
+                    """, df[DAILY_COLUMNS].itertuples(index=False, name=None))
 
                 # 更新缓存元数据
-                cursor.execute("""
+                conn.execute("""
                     INSERT OR REPLACE INTO cache_meta VALUES (?, ?, ?, ?)
-                """, (ts_code, datetime.now().strftime('%Y%m%d'), start_date, end_date))
+                """, (ts_code, datetime.now().strftime('%Y%m%d'), meta_start, max(end_date, meta[1] if meta else end_date)))
 
-                conn.commit()
-                print(f"已缓存 {len(df)} 条数据")
-        except Exception as e:
-            print(f"获取数据失败: {e}")
+            print(f"已缓存 {len(df)} 条数据")
+    except Exception as e:
+        print(f"获取数据失败: {e}")
+
+
+def _query_daily(conn, query: str, params, columns: list) -> pd.DataFrame:
+    """执行日线查询，fetchall 后按列构造 DataFrame（数值列直接转为 float64 数组）"""
+    rows = conn.execute(query, params).fetchall()
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame({
+        col: values if col in ('ts_code', 'trade_date') else np.asarray(values, dtype=np.float64)
+        for col, values in zip(columns, zip(*rows))
+    })
+
+
+# 成交量/成交额只用于量比等相对指标，float32 精度足够；价格列保持 float64，保证价格和收益计算精确
+VOLUME_DTYPES = {'vol': np.float32, 'amount': np.float32}
+
+
+# 交易日字符串 -> datetime64 的进程级缓存：所有股票共用同一批交易日，每个日期只解析一次
+_TRADE_DATES = {}
+
+
+def _parse_trade_dates(values) -> pd.DatetimeIndex:
+    """解析 YYYYMMDD 交易日字符串，已解析过的日期直接查表"""
+    cache = _TRADE_DATES
+    parsed = [cache.get(value) for value in values]
+    if None in parsed:
+        for i, value in enumerate(values):
+            if parsed[i] is None:
+                parsed[i] = cache[value] = np.datetime64(
+                    f"{value[:4]}-{value[4:6]}-{value[6:8]}", 'ns')
+    return pd.DatetimeIndex(np.array(parsed, dtype='datetime64[ns]'), name='trade_date')
+
+
+def _to_daily_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """转换日期格式并设为索引，成交量列压缩为 float32"""
+    df.index = _parse_trade_dates(df.pop('trade_date').tolist())
+    return df.astype(VOLUME_DTYPES, copy=False)
+
+
+def get_stock_data(ts_code: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    获取股票日线数据(后复权)
+
+    Args:
+        ts_code: 股票代码，如 '000001.SZ'
+        start_date: 开始日期 YYYYMMDD，默认3年前
+        end_date: 结束日期 YYYYMMDD，默认今天
+
+    Returns:
+        DataFrame: 包含 trade_date, open, high, low, close, vol 等列
+    """
+    start_date, end_date = _default_date_range(start_date, end_date)
+
+    # 检查缓存
+    conn = _get_conn()
+    _update_cache(conn, ts_code, start_date, end_date)
 
     # 从缓存读取
     query = """
@@ -167,27 +382,93 @@ def get_stock_data(ts_code: str, start_date: str = None, end_date: str = None) -
         WHERE ts_code = ? AND trade_date >= ? AND trade_date <= ?
         ORDER BY trade_date ASC
     """
-    df = pd.read_sql_query(query, conn, params=(ts_code, start_date, end_date))
-    conn.close()
+    df = _query_daily(conn, query, (ts_code, start_date, end_date), DAILY_COLUMNS[1:])
 
     if df.empty:
         print(f"警告: {ts_code} 无数据")
         return df
 
-    # 转换日期格式
-    df['trade_date'] = pd.to_datetime(df['trade_date'], format='%Y%m%d')
-    df.set_index('trade_date', inplace=True)
+    return _to_daily_frame(df)
+
 
-    return df
+def get_stock_data_bulk(codes: list, start_date: str = None, end_date: str = None,
+                        update: bool = True) -> dict:
+    """
+    批量获取多只股票日线数据，一次查询读取全部缓存
 
+    Args:
+        codes: 股票代码列表
+        start_date: 开始日期 YYYYMMDD，默认3年前
+        end_date: 结束日期 YYYYMMDD，默认今天
+        update: 是否先从 tushare 更新过期缓存；为False时只返回缓存已是最新的股票
+
+    Returns:
+        {股票代码: DataFrame}，无数据的股票不包含在内
+    """
+    start_date, end_date = _default_date_range(start_date, end_date)
+    if not codes:
+        return {}
+
+    conn = _get_conn()
+    placeholders = ','.join('?' * len(codes))
+
+    if update:
+        for ts_code in codes:
+            _update_cache(conn, ts_code, start_date, end_date)
+    else:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT ts_code, start_date, end_date, last_update FROM cache_meta WHERE ts_code IN ({placeholders})",
+            list(codes)
+        )
+        codes = [row[0] for row in cursor.fetchall() if _is_cache_fresh(row[1:], start_date, end_date)]
+        if not codes:
+            return {}
+        placeholders = ','.join('?' * len(codes))
+
+    query = f"""
+        SELECT ts_code, trade_date, open, high, low, close, vol, amount
+        FROM daily_data
+        WHERE ts_code IN ({placeholders}) AND trade_date >= ? AND trade_date <= ?
+        ORDER BY ts_code, trade_date ASC
+    """
+    df = _query_daily(conn, query, (*codes, start_date, end_date), DAILY_COLUMNS)
+
+    return {
+        ts_code: _to_daily_frame(group.drop(columns='ts_code').reset_index(drop=True))
+        for ts_code, group in df.groupby('ts_code', sort=False)
+    }
+
+
+def _latest_from_frame(df: pd.DataFrame) -> dict:
+    """日线数据最后一行转为最新价格字典"""
+    latest = df.iloc[-1]
+    return {
+        'date': df.index[-1].strftime('%Y-%m-%d'),
+        'close': latest['close'],
+        'open': latest['open'],
+        'high': latest['high'],
+        'low': latest['low'],
+        'vol': latest['vol']
+    }
+
+
+def get_latest_price(ts_code: str, df: pd.DataFrame = None) -> dict:
+    """
+    获取最新实际价格（不复权）
+
+    Args:
+        ts_code: 股票代码
+        df: 已读取的日线数据；最后一根K线是今天时直接使用（前复权的最新价即实际价格），不再请求 tushare
+    """
+    if df is not None and not df.empty and df.index[-1].strftime('%Y%m%d') == datetime.now().strftime('%Y%m%d'):
+        return _latest_from_frame(df)
 
-def get_latest_price(ts_code: str) -> dict:
-    """获取最新实际价格（不复权）"""
     try:
         # 获取不复权的实际价格
-        df = pro.daily(ts_code=ts_code, limit=1)
-        if df is not None and not df.empty:
-            row = df.iloc[0]
+        daily = pro.daily(ts_code=ts_code, limit=1)
+        if daily is not None and not daily.empty:
+            row = daily.iloc[0]
             return {
                 'date': f"{row['trade_date'][:4]}-{row['trade_date'][4:6]}-{row['trade_date'][6:]}",
                 'close': row['close'],
@@ -200,18 +481,11 @@ def get_latest_price(ts_code: str) -> dict:
         print(f"获取最新价格失败: {e}")
 
     # 备用：从缓存获取（后复权价格）
-    df = get_stock_data(ts_code)
+    if df is None or df.empty:
+        df = get_stock_data(ts_code)
     if df.empty:
         return None
-    latest = df.iloc[-1]
-    return {
-        'date': df.index[-1].strftime('%Y-%m-%d'),
-        'close': latest['close'],
-        'open': latest['open'],
-        'high': latest['high'],
-        'low': latest['low'],
-        'vol': latest['vol']
-    }
+    return _latest_from_frame(df)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+"""
+Gunicorn 配置
+启动: gunicorn -c gunicorn_conf.py app:app
+"""
+# gevent 需在任何 socket/ssl 模块导入前打补丁；preload_app 下主进程会先加载配置再导入 app
+from gevent import monkey
+monkey.patch_all()
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# 协程 worker：Tushare/Redis/SQLite 等 I/O 等待期间可切换处理其他请求
+worker_class = 'gevent'
+worker_connections = 1000
+keepalive = 5
+timeout = 120  # 批量分析耗时较长
+
+# 主进程中完成数据库初始化与蓝图注册，worker fork 后共享
+preload_app = True
+
+# 日志目录未纳入版本库，全新检出时需先创建，否则gunicorn启动即报错
+os.makedirs('logs', exist_ok=True)
+accesslog = 'logs/access.log'
+errorlog = 'logs/error.log'
@@ -2,9 +2,304 @@
 技术指标计算模块
 包含均线(MA)、MACD、RSI、成交量指标
 """
+import os
+import glob
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
+from config import CACHE_DIR
+from numba_compat import njit, NUMBA_AVAILABLE
 
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+try:
+    import pyarrow  # noqa: F401  读写 Parquet 指标缓存
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均，等价于 pd.Series.ewm(span=span, adjust=False).mean()
+
+    y[0] = x[0], y[i] = (1-α)·y[i-1] + α·x[i]，α = 2/(span+1)；
+    安装了 scipy 时用 lfilter 一次完成递推，否则使用 pandas
+    """
+    if lfilter is None or len(values) == 0 or np.isnan(values).any():
+        return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+    alpha = 2 / (span + 1)
+    ema, _ = lfilter([alpha], [1.0, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+    return ema
+
+
+def _values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """取出一列为 float64 数组"""
+    return df[column].to_numpy(dtype=np.float64)
+
+
+# ==================== 数组计算（各指标返回 {列名: 数组}） ====================
+
+def _ma_np(close: np.ndarray, periods) -> dict:
+    """各周期移动平均线"""
+    # 不用累加和之差：平盘窗口下会产生末位误差，不同周期均线不再严格相等，影响金叉死叉判断；
+    # pandas 对窗口内数值全部相同的情况直接返回该值
+    series = pd.Series(close)
+    return {f'MA{period}': series.rolling(window=period).mean().to_numpy() for period in periods}
+
+
+def _macd_np(close: np.ndarray, fast: int, slow: int, signal: int) -> dict:
+    """MACD：DIF = 快速EMA - 慢速EMA，DEA = DIF的EMA，MACD柱 = (DIF - DEA) * 2"""
+    dif = _ema(close, fast) - _ema(close, slow)
+    dea = _ema(dif, signal)
+    return {'DIF': dif, 'DEA': dea, 'MACD': (dif - dea) * 2}
+
+
+def _rsi_np(close: np.ndarray, period: int) -> dict:
+    """RSI（涨跌幅用EMA平均）"""
+    # 计算价格变化（首日无变化）
+    delta = np.diff(close, prepend=close[:1])
+
+    # 分离上涨和下跌（缺失值按0处理）
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    # 计算RS和RSI（无下跌时RSI=100，无涨跌时为NaN）
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = _ema(gain, period) / _ema(loss, period)
+        return {'RSI': 100 - (100 / (1 + rs))}
+
+
+def _boll_np(close: np.ndarray, period: int, std_dev: float, mid: np.ndarray = None) -> dict:
+    """布林带；mid 为已算好的同周期均线时直接作为中轨"""
+    series = pd.Series(close)
+    if mid is None:
+        mid = series.rolling(window=period).mean().to_numpy()
+    rolling_std = series.rolling(window=period).std().to_numpy()
+
+    up = mid + std_dev * rolling_std
+    down = mid - std_dev * rolling_std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'BOLL_MID': mid,
+            'BOLL_UP': up,
+            'BOLL_DOWN': down,
+            'BOLL_WIDTH': (up - down) / mid,
+            # 窗口内价格完全不变时带宽为0，价格位置无意义
+            'BOLL_POS': np.where(rolling_std == 0, np.nan, (close - down) / (up - down)),
+        }
+
+
+def _kdj_np(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int, m1: int, m2: int) -> dict:
+    """KDJ"""
+    # 计算N日内最高价和最低价
+    low_n = pd.Series(low).rolling(window=n).min().to_numpy()
+    high_n = pd.Series(high).rolling(window=n).max().to_numpy()
+
+    # RSV = (收盘价 - N日最低) / (N日最高 - N日最低) * 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = (close - low_n) / (high_n - low_n) * 100
+
+    # K = RSV的M1日移动平均 (使用EMA平滑)
+    # D = K的M2日移动平均
+    # 有 numba 时用JIT递推，否则用 scipy 的 lfilter 向量化，都没有时退化为Python循环
+    if NUMBA_AVAILABLE or lfilter is None:
+        k_values, d_values = _kdj_loop(rsv, m1, m2)
+    else:
+        k_values, d_values = _kdj_lfilter(rsv, m1, m2)
+
+    return {'K': k_values, 'D': d_values, 'J': 3 * k_values - 2 * d_values}
+
+
+def _volume_np(vol: np.ndarray) -> dict:
+    """5日均量和量比（当日成交量/5日均量）"""
+    vol_ma5 = pd.Series(vol).rolling(window=5).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {'VOL_MA5': vol_ma5, 'VOL_RATIO': vol / vol_ma5}
+
+
+@njit(cache=True)
+def _kdj_loop(rsv: np.ndarray, m1: int, m2: int):
+    """KDJ平滑递推：K、D初始值为50，RSV为NaN的位置K、D也为NaN且不更新状态"""
+    n = len(rsv)
+    k_values = np.empty(n)
+    d_values = np.empty(n)
+    k_prev = 50.0
+    d_prev = 50.0
+
+    for i in range(n):
+        if np.isnan(rsv[i]):
+            k_values[i] = np.nan
+            d_values[i] = np.nan
+        else:
+            k = (m1 - 1) / m1 * k_prev + 1 / m1 * rsv[i]
+            d = (m2 - 1) / m2 * d_prev + 1 / m2 * k
+            k_values[i] = k
+            d_values[i] = d
+            k_prev = k
+            d_prev = d
+
+    return k_values, d_values
+
+
+def _kdj_lfilter(rsv: np.ndarray, m1: int, m2: int):
+    """
+    无 numba 时的KDJ平滑：递推 k = (m1-1)/m1 * k_prev + 1/m1 * rsv 是一阶IIR滤波，
+    用 lfilter 在有效RSV序列上计算（NaN位置不更新状态，等价于跳过），结果与 _kdj_loop 一致
+    """
+    valid = ~np.isnan(rsv)
+    k_values = np.full(len(rsv), np.nan)
+    d_values = np.full(len(rsv), np.nan)
+    if not valid.any():
+        return k_values, d_values
+
+    k_decay = (m1 - 1) / m1
+    d_decay = (m2 - 1) / m2
+    k, _ = lfilter([1 / m1], [1.0, -k_decay], rsv[valid], zi=[k_decay * 50.0])
+    d, _ = lfilter([1 / m2], [1.0, -d_decay], k, zi=[d_decay * 50.0])
+    k_values[valid] = k
+    d_values[valid] = d
+    return k_values, d_values
+
+
+@njit(cache=True)
+def _rolling_mean_into(values: np.ndarray, window: int, out: np.ndarray):
+    """
+    滑动平均写入 out（前 window-1 个位置不写），输入不能含NaN
+
+    算法与 pandas rolling(window).mean() 相同，结果逐位一致：先移出再加入、移出和加入各自做 Kahan 补偿，
+    窗口内数值全部相同时直接取该值（平盘时各周期均线严格相等）
+    """
+    total = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    same = 0
+    prev = values[0] if len(values) > 0 else 0.0
+    for i in range(len(values)):
+        if i >= window:
+            y = -values[i - window] - comp_remove
+            t = total + y
+            comp_remove = t - total - y
+            total = t
+        x = values[i]
+        y = x - comp_add
+        t = total + y
+        comp_add = t - total - y
+        total = t
+        same = same + 1 if x == prev else 1
+        prev = x
+        if i >= window - 1:
+            out[i] = x if same >= window else total / window
+
+
+# 融合内核输出的指标列（顺序与 calc_all_indicators 逐个计算时一致）
+_FUSED_COLUMNS = ('MA5', 'MA10', 'MA20', 'MA60', 'DIF', 'DEA', 'MACD', 'RSI',
+                  'BOLL_MID', 'BOLL_UP', 'BOLL_DOWN', 'BOLL_WIDTH', 'BOLL_POS',
+                  'K', 'D', 'J', 'VOL_MA5', 'VOL_RATIO')
+
+
+@njit(cache=True, error_model='numpy')
+def _fused_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray, vol: np.ndarray) -> np.ndarray:
+    """
+    一次遍历K线计算全部指标（参数与 calc_all_indicators 默认值相同），输入不能含NaN
+
+    均线/均量与 pandas 滚动均值逐位一致（见 _rolling_mean_into），EMA/KDJ 维护递推状态，
+    布林带标准差和KDJ的N日高低点在窗口内直接计算；返回 (len(_FUSED_COLUMNS), n) 数组，每行一个指标
+    """
+    n = len(close)
+    out = np.full((18, n), np.nan)
+
+    # 均线 MA5/10/20/60、5日均量
+    _rolling_mean_into(close, 5, out[0])
+    _rolling_mean_into(close, 10, out[1])
+    _rolling_mean_into(close, 20, out[2])
+    _rolling_mean_into(close, 60, out[3])
+    _rolling_mean_into(vol, 5, out[16])
+
+    a_fast = 2 / (12 + 1)
+    a_slow = 2 / (26 + 1)
+    a_signal = 2 / (9 + 1)
+    a_rsi = 2 / (14 + 1)
+    ema_fast = ema_slow = dea = 0.0
+    avg_gain = avg_loss = 0.0
+
+    k_prev = 50.0
+    d_prev = 50.0
+
+    for i in range(n):
+        c = close[i]
+
+        # MACD（EMA首值为首个输入）
+        if i == 0:
+            ema_fast = ema_slow = c
+        else:
+            ema_fast = (1 - a_fast) * ema_fast + a_fast * c
+            ema_slow = (1 - a_slow) * ema_slow + a_slow * c
+        dif = ema_fast - ema_slow
+        dea = dif if i == 0 else (1 - a_signal) * dea + a_signal * dif
+        out[4, i] = dif
+        out[5, i] = dea
+        out[6, i] = (dif - dea) * 2
+
+        # RSI（首日无涨跌）
+        delta = c - close[i - 1] if i > 0 else 0.0
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if i == 0:
+            avg_gain = gain
+            avg_loss = loss
+        else:
+            avg_gain = (1 - a_rsi) * avg_gain + a_rsi * gain
+            avg_loss = (1 - a_rsi) * avg_loss + a_rsi * loss
+        out[7, i] = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        # 布林带（中轨=MA20，样本标准差）
+        if i >= 19:
+            mid = out[2, i]
+            lo = hi = c
+            ssd = 0.0
+            for t in range(i - 19, i + 1):
+                x = close[t]
+                ssd += (x - mid) * (x - mid)
+                lo = min(lo, x)
+                hi = max(hi, x)
+            std = np.sqrt(ssd / 19) if hi > lo else 0.0
+            up = mid + 2.0 * std
+            down = mid - 2.0 * std
+            out[8, i] = mid
+            out[9, i] = up
+            out[10, i] = down
+            out[11, i] = (up - down) / mid
+            if std > 0:
+                out[12, i] = (c - down) / (up - down)
+
+        # KDJ（RSV为NaN时不更新K、D状态）
+        if i >= 8:
+            low_n = low[i]
+            high_n = high[i]
+            for t in range(i - 8, i):
+                low_n = min(low_n, low[t])
+                high_n = max(high_n, high[t])
+            rsv = (c - low_n) / (high_n - low_n) * 100
+            if not np.isnan(rsv):
+                k_prev = 2 / 3 * k_prev + 1 / 3 * rsv
+                d_prev = 2 / 3 * d_prev + 1 / 3 * k_prev
+                out[13, i] = k_prev
+                out[14, i] = d_prev
+                out[15, i] = 3 * k_prev - 2 * d_prev
+
+        # 量比
+        if i >= 4:
+            out[17, i] = vol[i] / out[16, i]
+
+    return out
+
+
+# ==================== DataFrame 接口 ====================
 
 def calc_ma(df: pd.DataFrame, periods: list = [5, 10, 20, 60]) -> pd.DataFrame:
     """
@@ -17,10 +312,7 @@ def calc_ma(df: pd.DataFrame, periods: list = [5, 10, 20, 60]) -> pd.DataFrame:
     Returns:
         添加了 MA{period} 列的 DataFrame
     """
-    df = df.copy()
-    for period in periods:
-        df[f'MA{period}'] = df['close'].rolling(window=period).mean()
-    return df
+    return df.assign(**_ma_np(_values(df, 'close'), periods))
 
 
 def calc_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> pd.DataFrame:
@@ -39,22 +331,7 @@ def calc_macd(df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9)
         - DEA: DIF的EMA (信号线)
         - MACD: (DIF - DEA) * 2 (柱状图)
     """
-    df = df.copy()
-
-    # 计算EMA
-    ema_fast = df['close'].ewm(span=fast, adjust=False).mean()
-    ema_slow = df['close'].ewm(span=slow, adjust=False).mean()
-
-    # DIF = 快线 - 慢线
-    df['DIF'] = ema_fast - ema_slow
-
-    # DEA = DIF的9日EMA
-    df['DEA'] = df['DIF'].ewm(span=signal, adjust=False).mean()
-
-    # MACD柱 = (DIF - DEA) * 2
-    df['MACD'] = (df['DIF'] - df['DEA']) * 2
-
-    return df
+    return df.assign(**_macd_np(_values(df, 'close'), fast, slow, signal))
 
 
 def calc_rsi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
@@ -70,24 +347,7 @@ def calc_rsi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
         RSI < 30: 超卖
         RSI > 70: 超买
     """
-    df = df.copy()
-
-    # 计算价格变化
-    delta = df['close'].diff()
-
-    # 分离上涨和下跌
-    gain = delta.where(delta > 0, 0)
-    loss = (-delta).where(delta < 0, 0)
-
-    # 计算平均涨跌幅（使用EMA）
-    avg_gain = gain.ewm(span=period, adjust=False).mean()
-    avg_loss = loss.ewm(span=period, adjust=False).mean()
-
-    # 计算RS和RSI
-    rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-
-    return df
+    return df.assign(**_rsi_np(_values(df, 'close'), period))
 
 
 def calc_bollinger(df: pd.DataFrame, period: int = 20, std_dev: float = 2.0) -> pd.DataFrame:
@@ -107,25 +367,10 @@ def calc_bollinger(df: pd.DataFrame, period: int = 20, std_dev: float = 2.0) ->
         - BOLL_WIDTH: 带宽 (上轨-下轨)/中轨
         - BOLL_POS: 价格在带中的位置 (0-1, 0=下轨, 1=上轨)
     """
-    df = df.copy()
-
-    # 中轨 = N日均线
-    df['BOLL_MID'] = df['close'].rolling(window=period).mean()
-
-    # 标准差
-    rolling_std = df['close'].rolling(window=period).std()
-
-    # 上轨和下轨
-    df['BOLL_UP'] = df['BOLL_MID'] + std_dev * rolling_std
-    df['BOLL_DOWN'] = df['BOLL_MID'] - std_dev * rolling_std
-
-    # 带宽
-    df['BOLL_WIDTH'] = (df['BOLL_UP'] - df['BOLL_DOWN']) / df['BOLL_MID']
-
-    # 价格位置 (0=下轨, 1=上轨)
-    df['BOLL_POS'] = (df['close'] - df['BOLL_DOWN']) / (df['BOLL_UP'] - df['BOLL_DOWN'])
-
-    return df
+    # 中轨 = N日均线（calc_ma 已算过同周期均线时直接复用）
+    ma_col = f'MA{period}'
+    mid = _values(df, ma_col) if ma_col in df.columns else None
+    return df.assign(**_boll_np(_values(df, 'close'), period, std_dev, mid))
 
 
 def calc_kdj(df: pd.DataFrame, n: int = 9, m1: int = 3, m2: int = 3) -> pd.DataFrame:
@@ -146,40 +391,7 @@ def calc_kdj(df: pd.DataFrame, n: int = 9, m1: int = 3, m2: int = 3) -> pd.DataF
         K/D < 20: 超卖区
         K/D > 80: 超买区
     """
-    df = df.copy()
-
-    # 计算N日内最高价和最低价
-    low_n = df['low'].rolling(window=n).min()
-    high_n = df['high'].rolling(window=n).max()
-
-    # RSV = (收盘价 - N日最低) / (N日最高 - N日最低) * 100
-    rsv = (df['close'] - low_n) / (high_n - low_n) * 100
-
-    # K = RSV的M1日移动平均 (使用EMA平滑)
-    # D = K的M2日移动平均
-    # 初始值设为50
-    k_values = []
-    d_values = []
-    k_prev = 50
-    d_prev = 50
-
-    for i in range(len(df)):
-        if pd.isna(rsv.iloc[i]):
-            k_values.append(np.nan)
-            d_values.append(np.nan)
-        else:
-            k = (m1 - 1) / m1 * k_prev + 1 / m1 * rsv.iloc[i]
-            d = (m2 - 1) / m2 * d_prev + 1 / m2 * k
-            k_values.append(k)
-            d_values.append(d)
-            k_prev = k
-            d_prev = d
-
-    df['K'] = k_values
-    df['D'] = d_values
-    df['J'] = 3 * df['K'] - 2 * df['D']
-
-    return df
+    return df.assign(**_kdj_np(_values(df, 'high'), _values(df, 'low'), _values(df, 'close'), n, m1, m2))
 
 
 def calc_volume_indicators(df: pd.DataFrame) -> pd.DataFrame:
@@ -194,34 +406,137 @@ def calc_volume_indicators(df: pd.DataFrame) -> pd.DataFrame:
         - VOL_MA5: 5日均量
         - VOL_RATIO: 量比（当日成交量/5日均量）
     """
-    df = df.copy()
-
-    # 5日均量
-    df['VOL_MA5'] = df['vol'].rolling(window=5).mean()
-
-    # 量比
-    df['VOL_RATIO'] = df['vol'] / df['VOL_MA5']
-
-    return df
+    return df.assign(**_volume_np(_values(df, 'vol')))
 
 
 def calc_all_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
     计算所有技术指标
 
+    价格、成交量各取一次数组，所有指标在数组上计算后一次性添加到 DataFrame；
+    有 numba 且数据无缺失时用融合内核一次遍历算完
+
     Args:
         df: 原始K线数据
 
     Returns:
         包含所有指标的 DataFrame
     """
-    df = calc_ma(df)
-    df = calc_macd(df)
-    df = calc_rsi(df)
-    df = calc_bollinger(df)
-    df = calc_kdj(df)
-    df = calc_volume_indicators(df)
-    return df
+    close = _values(df, 'close')
+    high, low, vol = _values(df, 'high'), _values(df, 'low'), _values(df, 'vol')
+    if NUMBA_AVAILABLE and not np.isnan(np.stack([high, low, close, vol])).any():
+        return _attach_indicators(df, _FUSED_COLUMNS, _fused_indicators(high, low, close, vol))
+
+    columns = _ma_np(close, [5, 10, 20, 60])
+    columns.update(_macd_np(close, 12, 26, 9))
+    columns.update(_rsi_np(close, 14))
+    columns.update(_boll_np(close, 20, 2.0, mid=columns['MA20']))
+    columns.update(_kdj_np(high, low, close, 9, 3, 3))
+    columns.update(_volume_np(vol))
+    return _attach_indicators(df, list(columns), np.stack(list(columns.values())))
+
+
+def _attach_indicators(df: pd.DataFrame, columns, values: np.ndarray) -> pd.DataFrame:
+    """
+    把 (k, n) 指标矩阵作为一个 float64 数据块拼接到K线数据之后
+
+    每个指标是矩阵的一行（内存连续），整体只占一个数据块，
+    之后的复制、拼接和按列读取都不必逐列处理
+    """
+    existing = df.columns.intersection(columns)
+    if len(existing):
+        df = df.drop(columns=existing)
+    block = pd.DataFrame(values.T, index=df.index, columns=columns, copy=False)
+    return pd.concat([df, block], axis=1, copy=False)
+
+
+# 指标计算结果缓存：同一股票同一份K线数据（最后交易日和行数相同）不重复计算
+# 内存中保留最近使用的结果，安装了 pyarrow 时另存 Parquet 文件供之后的运行复用
+INDICATOR_CACHE_SIZE = 128
+INDICATOR_CACHE_DIR = os.path.join(CACHE_DIR, 'indicators')
+_indicator_cache = OrderedDict()
+# Web端多线程并发访问缓存，查找/调整顺序/淘汰需加锁（计算在锁外进行）
+_indicator_cache_lock = threading.Lock()
+
+
+def _indicator_cache_path(ts_code: str, last_date, n_rows: int) -> str:
+    """指标缓存文件路径（文件名包含最后交易日和行数，数据变化即失效）"""
+    return os.path.join(INDICATOR_CACHE_DIR, f"{ts_code}_{last_date:%Y%m%d}_{n_rows}.parquet")
+
+
+def _load_indicators(path: str) -> pd.DataFrame:
+    """读取指标缓存文件，不存在或损坏时返回None"""
+    if not (PARQUET_AVAILABLE and os.path.exists(path)):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+
+def _save_indicators(ts_code: str, path: str, df: pd.DataFrame):
+    """写入指标缓存文件，并删除该股票最后交易日更早的缓存"""
+    if not PARQUET_AVAILABLE:
+        return
+    try:
+        os.makedirs(INDICATOR_CACHE_DIR, exist_ok=True)
+        # 只删除旧交易日的文件；同一交易日不同年限（行数）的缓存各自保留，避免互相删除
+        prefix = os.path.join(INDICATOR_CACHE_DIR, f"{ts_code}_")
+        last_date = f"{df.index[-1]:%Y%m%d}"
+        for old_path in glob.glob(f"{prefix}*.parquet"):
+            if old_path[len(prefix):].split('_')[0] < last_date:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass  # 已被其他进程删除
+        # 先写临时文件再替换，避免其他进程/线程读到写了一半的文件
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, engine='pyarrow', compression='snappy')
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"写入指标缓存失败: {e}")
+
+
+def calc_all_indicators_cached(ts_code: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    带缓存的 calc_all_indicators：依次查内存、Parquet 文件，都未命中才计算
+
+    Args:
+        ts_code: 股票代码
+        df: 原始K线数据
+
+    Returns:
+        包含所有指标的 DataFrame（缓存结果的副本，可安全修改）
+    """
+    if df.empty:
+        return calc_all_indicators(df)
+
+    key = (ts_code, df.index[-1], len(df))
+    with _indicator_cache_lock:
+        cached = _indicator_cache.get(key)
+        if cached is not None:
+            _indicator_cache.move_to_end(key)
+    if cached is None:
+        path = _indicator_cache_path(*key)
+        cached = _load_indicators(path)
+        if cached is None:
+            cached = calc_all_indicators(df)
+            _save_indicators(ts_code, path, cached)
+        with _indicator_cache_lock:
+            _indicator_cache[key] = cached
+            if len(_indicator_cache) > INDICATOR_CACHE_SIZE:
+                _indicator_cache.popitem(last=False)
+    return cached.copy()
+
+
+# get_indicator_status 使用的列（缺失的列按NaN处理）
+_STATUS_COLS = ('close', 'MA5', 'MA10', 'MA20', 'MA60', 'DIF', 'DEA', 'MACD',
+                'BOLL_UP', 'BOLL_MID', 'BOLL_DOWN', 'BOLL_POS', 'K', 'D', 'J')
+_STATUS_IDX = {col: i for i, col in enumerate(_STATUS_COLS)}
+
+# 交叉判断的 (快线, 慢线) 列对：均线、MACD、KDJ
+_CROSS_FAST = [_STATUS_IDX[col] for col in ('MA5', 'DIF', 'K')]
+_CROSS_SLOW = [_STATUS_IDX[col] for col in ('MA20', 'DEA', 'D')]
 
 
 def get_indicator_status(df: pd.DataFrame) -> dict:
@@ -237,43 +552,26 @@ def get_indicator_status(df: pd.DataFrame) -> dict:
     if df.empty or len(df) < 2:
         return None
 
-    latest = df.iloc[-1]
-    prev = df.iloc[-2]
-
-    # 均线状态
-    ma5 = latest.get('MA5', np.nan)
-    ma20 = latest.get('MA20', np.nan)
-    ma5_prev = prev.get('MA5', np.nan)
-    ma20_prev = prev.get('MA20', np.nan)
-
-    # 判断均线交叉
-    ma_cross = None
-    if not (np.isnan(ma5) or np.isnan(ma20) or np.isnan(ma5_prev) or np.isnan(ma20_prev)):
-        if ma5_prev <= ma20_prev and ma5 > ma20:
-            ma_cross = 'golden'  # 金叉
-        elif ma5_prev >= ma20_prev and ma5 < ma20:
-            ma_cross = 'dead'  # 死叉
-
-    # MACD状态
-    dif = latest.get('DIF', np.nan)
-    dea = latest.get('DEA', np.nan)
-    dif_prev = prev.get('DIF', np.nan)
-    dea_prev = prev.get('DEA', np.nan)
-
-    # 判断MACD交叉
-    macd_cross = None
-    if not (np.isnan(dif) or np.isnan(dea) or np.isnan(dif_prev) or np.isnan(dea_prev)):
-        if dif_prev <= dea_prev and dif > dea:
-            macd_cross = 'golden'  # 金叉
-        elif dif_prev >= dea_prev and dif < dea:
-            macd_cross = 'dead'  # 死叉
+    # 最近两行一次性取成数组，prev/latest 按列位置读取
+    prev, latest = df.reindex(columns=_STATUS_COLS).iloc[-2:].to_numpy(dtype=np.float64)
+    values = dict(zip(_STATUS_COLS, latest))
 
-    # 布林带状态
-    boll_up = latest.get('BOLL_UP', np.nan)
-    boll_mid = latest.get('BOLL_MID', np.nan)
-    boll_down = latest.get('BOLL_DOWN', np.nan)
-    boll_pos = latest.get('BOLL_POS', np.nan)
+    # 均线、MACD、KDJ交叉（四个值都有效时才判断）
+    fast, slow = latest[_CROSS_FAST], latest[_CROSS_SLOW]
+    fast_prev, slow_prev = prev[_CROSS_FAST], prev[_CROSS_SLOW]
+    valid = ~np.isnan(np.stack([fast, slow, fast_prev, slow_prev])).any(axis=0)
+    golden = valid & (fast_prev <= slow_prev) & (fast > slow)
+    dead = valid & (fast_prev >= slow_prev) & (fast < slow)
+    ma_cross, macd_cross, kdj_cross = [
+        'golden' if g else ('dead' if d else None) for g, d in zip(golden, dead)  # 金叉/死叉
+    ]
+
+    # 快线是否在慢线上方
+    above = [f > s if not (np.isnan(f) or np.isnan(s)) else None for f, s in zip(fast, slow)]
+    ma5_above_ma20, dif_above_dea, k_above_d = above
 
+    # 布林带状态
+    boll_pos = values['BOLL_POS']
     boll_status = None
     if not np.isnan(boll_pos):
         if boll_pos <= 0:
@@ -287,22 +585,8 @@ def get_indicator_status(df: pd.DataFrame) -> dict:
         else:
             boll_status = 'middle'       # 中间区域
 
-    # KDJ状态
-    k = latest.get('K', np.nan)
-    d = latest.get('D', np.nan)
-    j = latest.get('J', np.nan)
-    k_prev = prev.get('K', np.nan)
-    d_prev = prev.get('D', np.nan)
-
-    # KDJ交叉
-    kdj_cross = None
-    if not (np.isnan(k) or np.isnan(d) or np.isnan(k_prev) or np.isnan(d_prev)):
-        if k_prev <= d_prev and k > d:
-            kdj_cross = 'golden'  # 金叉
-        elif k_prev >= d_prev and k < d:
-            kdj_cross = 'dead'    # 死叉
-
     # KDJ区域
+    k = values['K']
     kdj_zone = None
     if not np.isnan(k):
         if k < 20:
@@ -313,34 +597,33 @@ def get_indicator_status(df: pd.DataFrame) -> dict:
             kdj_zone = 'normal'
 
     return {
-        'close': latest['close'],
-        'MA5': ma5,
-        'MA10': latest.get('MA10', np.nan),
-        'MA20': ma20,
-        'MA60': latest.get('MA60', np.nan),
-        'DIF': dif,
-        'DEA': dea,
-        'MACD': latest.get('MACD', np.nan),
+        'close': values['close'],
+        'MA5': values['MA5'],
+        'MA10': values['MA10'],
+        'MA20': values['MA20'],
+        'MA60': values['MA60'],
+        'DIF': values['DIF'],
+        'DEA': values['DEA'],
+        'MACD': values['MACD'],
         'ma_cross': ma_cross,
         'macd_cross': macd_cross,
-        'ma5_above_ma20': ma5 > ma20 if not (np.isnan(ma5) or np.isnan(ma20)) else None,
-        'dif_above_dea': dif > dea if not (np.isnan(dif) or np.isnan(dea)) else None,
+        'ma5_above_ma20': ma5_above_ma20,
+        'dif_above_dea': dif_above_dea,
         # 布林带
-        'BOLL_UP': boll_up,
-        'BOLL_MID': boll_mid,
-        'BOLL_DOWN': boll_down,
+        'BOLL_UP': values['BOLL_UP'],
+        'BOLL_MID': values['BOLL_MID'],
+        'BOLL_DOWN': values['BOLL_DOWN'],
         'BOLL_POS': boll_pos,
         'boll_status': boll_status,
         # KDJ
         'K': k,
-        'D': d,
-        'J': j,
+        'D': values['D'],
+        'J': values['J'],
         'kdj_cross': kdj_cross,
         'kdj_zone': kdj_zone,
-        'k_above_d': k > d if not (np.isnan(k) or np.isnan(d)) else None
+        'k_above_d': k_above_d
     }
 
-
 if __name__ == "__main__":
     # 测试
     from data import get_stock_data
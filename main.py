@@ -3,15 +3,23 @@
 A股量化买卖点判断系统
 主程序入口
 """
+import io
+import os
 import sys
 import argparse
 from datetime import datetime
+from functools import partial
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 
-from data import get_stock_data, get_stock_name, get_latest_price
-from indicators import calc_all_indicators
+from data import get_stock_data, get_stock_name, get_stock_names, get_latest_price
 from backtest import backtest_stock, calc_score
 
 
+# 代码首位 -> 市场后缀：6上海，0/3深圳，8/4北交所，其余默认深圳
+_MARKET_BY_PREFIX = {'6': 'SH', '0': 'SZ', '3': 'SZ', '8': 'BJ', '4': 'BJ'}
+
+
 def normalize_code(code: str) -> str:
     """
     标准化股票代码格式
@@ -28,33 +36,204 @@ def normalize_code(code: str) -> str:
         return code
 
     # 根据代码前缀判断市场
-    if code.startswith('6'):
-        return f"{code}.SH"  # 上海
-    elif code.startswith(('0', '3')):
-        return f"{code}.SZ"  # 深圳
-    elif code.startswith('8') or code.startswith('4'):
-        return f"{code}.BJ"  # 北交所
-    else:
-        return f"{code}.SZ"  # 默认深圳
+    return f"{code}.{_MARKET_BY_PREFIX.get(code[:1], 'SZ')}"
+
+
+# ==================== 输出格式 ====================
+
+# 信号值 -> 显示文本
+SIGNAL_TEXT = {2: '🔥 强烈买入', 1: '🔺 买入', -1: '🔻 卖出', -2: '💀 强烈卖出', 0: '⏸️  观望'}
+
+# 评分等级 -> 颜色标记
+GRADE_COLORS = {'A': '🟢', 'B': '🔵', 'C': '🟡', 'D': '🟠', 'E': '🔴'}
+
+# 策略名称 -> 当前信号字段
+STRATEGY_SIGNAL_KEYS = {
+    'MA+MACD': 'signal',
+    'Bollinger': 'signal_boll',
+    'KDJ': 'signal_kdj',
+    'RSI': 'signal_rsi',
+    'Volume': 'signal_volume',
+    'Combined': 'signal_combined'
+}
+
+# 完整模式下当前信号状态的显示行 (标签, 信号字段)
+_SIGNAL_ROWS = (
+    ('MA+MACD:  ', 'signal'),
+    ('布林带:   ', 'signal_boll'),
+    ('KDJ:      ', 'signal_kdj'),
+    ('RSI:      ', 'signal_rsi'),
+    ('成交量:   ', 'signal_volume'),
+)
+
+
+def _signal_text(signal) -> str:
+    """信号值对应的显示文本"""
+    return SIGNAL_TEXT.get(signal, '未知')
+
+
+def _render_score(scores: dict) -> str:
+    """综合评分摘要，如 '🔵 70分 (B级) - 建议'"""
+    grade = scores['grade']
+    return f"{GRADE_COLORS.get(grade, '')} {scores['total']}分 ({grade}级) - {scores['advice']}"
+
+
+def _render_strategy(strat: dict, profit: bool = True, hold_days: bool = True) -> list:
+    """单个策略回测表现的输出行"""
+    trade_count = strat['trade_count']
+    lines = [
+        f"  交易次数: {trade_count} 笔",
+        f"  总收益: {strat['total_return']:+.2f}%  年化: {strat['annual_return']:+.2f}%",
+        f"  胜率: {strat['win_rate']:.1f}% ({strat['win_count']}/{trade_count})",
+    ]
+    if profit:
+        lines.append(f"  盈亏比: 盈{strat['avg_win']:+.2f}% / 亏{strat['avg_loss']:.2f}%")
+    lines.append(f"  最大回撤: {strat['max_drawdown']:.2f}%")
+    lines.append(f"  夏普比率: {strat['sharpe_ratio']:.2f}")
+    if hold_days:
+        lines.append(f"  平均持仓: {strat['avg_hold_days']:.1f} 天")
+    return lines
+
+
+def _render_strategy_list(strategies: dict, names) -> list:
+    """多个策略的回测对比输出行"""
+    lines = []
+    for name in names:
+        strat = strategies.get(name)
+        if not strat:
+            lines.append(f"\n【{name}】 策略不存在")
+        elif strat.get('trade_count', 0) > 0:
+            lines.append(f"\n【{name}】")
+            lines.extend(_render_strategy(strat))
+        else:
+            lines.append(f"\n【{name}】 无有效交易信号")
+    return lines
+
+
+def _render_section(title: str) -> list:
+    """分节标题"""
+    return [f"\n{'─'*50}", title, '─'*50]
+
+
+def _render_combined(result: dict) -> list:
+    """综合策略简洁模式"""
+    lines = []
+    scores = calc_score(result)
+    if scores:
+        lines.append(f"\n综合评分: {_render_score(scores)}")
+
+    # 综合策略信号和评分
+    current_signals = result.get('current_signals', {})
+    combined_signal = current_signals.get('signal_combined', 0)
+    combined_score = current_signals.get('score_combined', 0)
+    lines.append(f"综合策略: {_signal_text(combined_signal)}  (信号评分: {combined_score:.0f}/100)")
+
+    # 综合策略回测表现
+    combined_strat = result.get('strategies', {}).get('Combined')
+    if combined_strat and combined_strat.get('trade_count', 0) > 0:
+        lines.append("\n历史表现:")
+        lines.extend(_render_strategy(combined_strat, profit=False, hold_days=False))
+    return lines
+
+
+def _render_best(result: dict) -> list:
+    """最佳策略模式"""
+    lines = []
+    strategies = result.get('strategies', {})
+    valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
+    if valid_strategies:
+        best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0))
 
-
-def analyze_stock(ts_code: str, mode='all', selected_strategies=None):
+        scores = calc_score(result)
+        if scores:
+            lines.append(f"\n综合评分: {_render_score(scores)}")
+
+        lines.append(f"\n最佳策略: 【{best_strategy['strategy_name']}】")
+        lines.extend(_render_strategy(best_strategy, hold_days=False))
+    return lines
+
+
+def _render_selected(result: dict, selected_strategies: list) -> list:
+    """选定策略模式"""
+    lines = []
+    scores = calc_score(result)
+    if scores:
+        lines.append(f"\n综合评分: {_render_score(scores)}")
+
+    # 只显示选定的策略
+    lines.extend(_render_section(f"选定策略回测对比 (近{result['years']}年)"))
+    lines.extend(_render_strategy_list(result.get('strategies', {}), selected_strategies))
+
+    # 显示这些策略的当前信号
+    current_signals = result.get('current_signals', {})
+    if current_signals:
+        lines.extend(_render_section("当前信号状态"))
+        for strategy_name in selected_strategies:
+            signal_key = STRATEGY_SIGNAL_KEYS.get(strategy_name)
+            if signal_key:
+                lines.append(f"  {strategy_name:12s}: {_signal_text(current_signals.get(signal_key, 0))}")
+    return lines
+
+
+def _render_all(result: dict) -> list:
+    """完整模式：评分明细 + 所有策略回测对比 + 当前信号"""
+    lines = []
+    scores = calc_score(result)
+    if scores:
+        # 显示综合评分（醒目）
+        lines.append(f"\n{'█'*50}")
+        lines.append(f"  综合评分: {_render_score(scores)}")
+        lines.append('█'*50)
+
+        # 评分明细
+        strategy_total = scores.get('strategy_winrate', 0) + scores.get('strategy_return', 0) + scores.get('strategy_sharpe', 0)
+        lines.append("\n评分明细:")
+        lines.append(f"  趋势 ({scores['trend']}/30): {scores['trend_text']}")
+        lines.append(f"  RSI  ({scores['rsi']}/20): {scores['rsi_text']}")
+        lines.append(f"  量能 ({scores['volume']}/10): {scores['volume_text']}")
+        lines.append(f"  策略 ({strategy_total}/40): {scores.get('strategy_text', '无数据')}")
+
+    # 显示策略回测对比
+    strategies = result.get('strategies', {})
+    if strategies:
+        lines.extend(_render_section(f"策略回测对比 (近{result['years']}年)"))
+        lines.extend(_render_strategy_list(strategies, strategies))
+
+    # 显示当前信号状态
+    current_signals = result.get('current_signals', {})
+    if current_signals:
+        lines.extend(_render_section("当前信号状态"))
+        for label, signal_key in _SIGNAL_ROWS:
+            lines.append(f"  {label}{_signal_text(current_signals.get(signal_key, 0))}")
+
+        # 综合策略 (醒目显示)
+        combined_signal = current_signals.get('signal_combined', 0)
+        combined_score = current_signals.get('score_combined', 0)
+        lines.append(f"\n  {'━'*46}")
+        lines.append(f"  【综合策略】 {_signal_text(combined_signal)}  (评分: {combined_score:.0f})")
+        lines.append(f"  {'━'*46}")
+    return lines
+
+
+def analyze_stock(ts_code: str, mode='all', selected_strategies=None, name=None):
     """分析单只股票并输出结果
 
     Args:
         ts_code: 股票代码
         mode: 显示模式 'all'(全部) 或 'combined'(仅综合策略) 或 'best'(最佳策略) 或 'selected'(选定策略)
         selected_strategies: 指定显示的策略列表
+        name: 股票名称（多只股票时预先批量获取），默认单独查询
     """
 
     ts_code = normalize_code(ts_code)
-    name = get_stock_name(ts_code)
+    if name is None:
+        name = get_stock_name(ts_code)
 
     print(f"\n{'='*50}")
     print(f"股票: {ts_code} ({name})")
     print('='*50)
 
-    # 获取数据并计算指标
+    # 获取数据（指标在回测中计算，同一份数据的指标结果会被缓存复用）
     print("正在分析...")
     df = get_stock_data(ts_code)
 
@@ -62,203 +241,58 @@ def analyze_stock(ts_code: str, mode='all', selected_strategies=None):
         print("错误: 无法获取股票数据，请检查代码是否正确")
         return
 
-    df = calc_all_indicators(df)
-
     # 当前状态
-    latest = get_latest_price(ts_code)
+    latest = get_latest_price(ts_code, df)
     if latest:
         print(f"\n当前价格: {latest['close']:.2f} 元 ({latest['date']})")
 
     # 基于形态回测
-    result = backtest_stock(ts_code, years=3)
-
-    if result and result.get('strategies'):
-        # === 综合策略简洁模式 ===
-        if mode == 'combined':
-            scores = calc_score(result)
-            if scores:
-                grade = scores['grade']
-                total = scores['total']
-                grade_colors = {'A': '🟢', 'B': '🔵', 'C': '🟡', 'D': '🟠', 'E': '🔴'}
-                color = grade_colors.get(grade, '')
-
-                print(f"\n综合评分: {color} {total}分 ({grade}级) - {scores['advice']}")
-
-            # 综合策略信号和评分
-            current_signals = result.get('current_signals', {})
-            combined_signal = current_signals.get('signal_combined', 0)
-            combined_score = current_signals.get('score_combined', 0)
-
-            signal_text = {2: '🔥 强烈买入', 1: '🔺 买入', -1: '🔻 卖出', -2: '💀 强烈卖出', 0: '⏸️  观望'}
-            print(f"综合策略: {signal_text.get(combined_signal, '未知')}  (信号评分: {combined_score:.0f}/100)")
-
-            # 综合策略回测表现
-            strategies = result.get('strategies', {})
-            combined_strat = strategies.get('Combined')
-            if combined_strat and combined_strat.get('trade_count', 0) > 0:
-                print(f"\n历史表现:")
-                print(f"  交易次数: {combined_strat['trade_count']} 笔")
-                print(f"  总收益: {combined_strat['total_return']:+.2f}%  年化: {combined_strat['annual_return']:+.2f}%")
-                print(f"  胜率: {combined_strat['win_rate']:.1f}% ({combined_strat['win_count']}/{combined_strat['trade_count']})")
-                print(f"  最大回撤: {combined_strat['max_drawdown']:.2f}%")
-                print(f"  夏普比率: {combined_strat['sharpe_ratio']:.2f}")
-
-            print()
-            return
+    result = backtest_stock(ts_code, years=3, df=df)
 
-        # === 最佳策略模式 ===
-        if mode == 'best':
-            strategies = result.get('strategies', {})
-            valid_strategies = [s for s in strategies.values() if s.get('trade_count', 0) > 0]
-            if valid_strategies:
-                best_strategy = max(valid_strategies, key=lambda s: s.get('total_return', 0))
-
-                scores = calc_score(result)
-                if scores:
-                    grade = scores['grade']
-                    total = scores['total']
-                    grade_colors = {'A': '🟢', 'B': '🔵', 'C': '🟡', 'D': '🟠', 'E': '🔴'}
-                    color = grade_colors.get(grade, '')
-                    print(f"\n综合评分: {color} {total}分 ({grade}级) - {scores['advice']}")
-
-                print(f"\n最佳策略: 【{best_strategy['strategy_name']}】")
-                print(f"  交易次数: {best_strategy['trade_count']} 笔")
-                print(f"  总收益: {best_strategy['total_return']:+.2f}%  年化: {best_strategy['annual_return']:+.2f}%")
-                print(f"  胜率: {best_strategy['win_rate']:.1f}% ({best_strategy['win_count']}/{best_strategy['trade_count']})")
-                print(f"  盈亏比: 盈{best_strategy['avg_win']:+.2f}% / 亏{best_strategy['avg_loss']:.2f}%")
-                print(f"  最大回撤: {best_strategy['max_drawdown']:.2f}%")
-                print(f"  夏普比率: {best_strategy['sharpe_ratio']:.2f}")
-
-            print()
-            return
+    # 按显示模式生成输出行，一次性打印
+    if not (result and result.get('strategies')):
+        lines = ["\n回测数据不足，无法给出建议"]
+    elif mode == 'combined':
+        lines = _render_combined(result)
+    elif mode == 'best':
+        lines = _render_best(result)
+    elif mode == 'selected' and selected_strategies:
+        lines = _render_selected(result, selected_strategies)
+    else:
+        lines = _render_all(result)
 
-        # === 选定策略模式 ===
-        if mode == 'selected' and selected_strategies:
-            scores = calc_score(result)
-            if scores:
-                grade = scores['grade']
-                total = scores['total']
-                grade_colors = {'A': '🟢', 'B': '🔵', 'C': '🟡', 'D': '🟠', 'E': '🔴'}
-                color = grade_colors.get(grade, '')
-                print(f"\n综合评分: {color} {total}分 ({grade}级) - {scores['advice']}")
-
-            # 只显示选定的策略
-            strategies = result.get('strategies', {})
-            print(f"\n{'─'*50}")
-            print(f"选定策略回测对比 (近{result['years']}年)")
-            print('─'*50)
-
-            for strategy_name in selected_strategies:
-                strat = strategies.get(strategy_name)
-                if strat:
-                    trade_count = strat.get('trade_count', 0)
-                    if trade_count > 0:
-                        print(f"\n【{strategy_name}】")
-                        print(f"  交易次数: {trade_count} 笔")
-                        print(f"  总收益: {strat['total_return']:+.2f}%  年化: {strat['annual_return']:+.2f}%")
-                        print(f"  胜率: {strat['win_rate']:.1f}% ({strat['win_count']}/{trade_count})")
-                        print(f"  盈亏比: 盈{strat['avg_win']:+.2f}% / 亏{strat['avg_loss']:.2f}%")
-                        print(f"  最大回撤: {strat['max_drawdown']:.2f}%")
-                        print(f"  夏普比率: {strat['sharpe_ratio']:.2f}")
-                        print(f"  平均持仓: {strat['avg_hold_days']:.1f} 天")
-                    else:
-                        print(f"\n【{strategy_name}】 无有效交易信号")
-                else:
-                    print(f"\n【{strategy_name}】 策略不存在")
-
-            # 显示这些策略的当前信号
-            current_signals = result.get('current_signals', {})
-            if current_signals:
-                print(f"\n{'─'*50}")
-                print("当前信号状态")
-                print('─'*50)
-                signal_text = {2: '🔥 强烈买入', 1: '🔺 买入', -1: '🔻 卖出', -2: '💀 强烈卖出', 0: '⏸️  观望'}
-
-                strategy_signal_map = {
-                    'MA+MACD': 'signal',
-                    'Bollinger': 'signal_boll',
-                    'KDJ': 'signal_kdj',
-                    'RSI': 'signal_rsi',
-                    'Volume': 'signal_volume',
-                    'Combined': 'signal_combined'
-                }
-
-                for strategy_name in selected_strategies:
-                    signal_key = strategy_signal_map.get(strategy_name)
-                    if signal_key:
-                        signal_val = current_signals.get(signal_key, 0)
-                        print(f"  {strategy_name:12s}: {signal_text.get(signal_val, '未知')}")
-
-            print()
-            return
+    lines.append('')
+    print('\n'.join(lines))
 
-        # === 完整模式 (默认) ===
-        # 计算综合评分
-        scores = calc_score(result)
 
-        if scores:
-            # 显示综合评分（醒目）
-            grade = scores['grade']
-            total = scores['total']
-            grade_colors = {'A': '🟢', 'B': '🔵', 'C': '🟡', 'D': '🟠', 'E': '🔴'}
-            color = grade_colors.get(grade, '')
-
-            print(f"\n{'█'*50}")
-            print(f"  综合评分: {color} {total}分 ({grade}级) - {scores['advice']}")
-            print(f"{'█'*50}")
-
-            # 评分明细
-            print(f"\n评分明细:")
-            print(f"  趋势 ({scores['trend']}/30): {scores['trend_text']}")
-            print(f"  RSI  ({scores['rsi']}/20): {scores['rsi_text']}")
-            print(f"  量能 ({scores['volume']}/10): {scores['volume_text']}")
-            print(f"  策略 ({scores.get('strategy_winrate', 0) + scores.get('strategy_return', 0) + scores.get('strategy_sharpe', 0)}/40): {scores.get('strategy_text', '无数据')}")
-
-        # 显示策略回测对比
-        strategies = result.get('strategies', {})
-        if strategies:
-            print(f"\n{'─'*50}")
-            print(f"策略回测对比 (近{result['years']}年)")
-            print('─'*50)
-
-            for name, strat in strategies.items():
-                trade_count = strat.get('trade_count', 0)
-                if trade_count > 0:
-                    print(f"\n【{name}】")
-                    print(f"  交易次数: {trade_count} 笔")
-                    print(f"  总收益: {strat['total_return']:+.2f}%  年化: {strat['annual_return']:+.2f}%")
-                    print(f"  胜率: {strat['win_rate']:.1f}% ({strat['win_count']}/{trade_count})")
-                    print(f"  盈亏比: 盈{strat['avg_win']:+.2f}% / 亏{strat['avg_loss']:.2f}%")
-                    print(f"  最大回撤: {strat['max_drawdown']:.2f}%")
-                    print(f"  夏普比率: {strat['sharpe_ratio']:.2f}")
-                    print(f"  平均持仓: {strat['avg_hold_days']:.1f} 天")
-                else:
-                    print(f"\n【{name}】 无有效交易信号")
-
-        # 显示当前信号状态
-        current_signals = result.get('current_signals', {})
-        if current_signals:
-            print(f"\n{'─'*50}")
-            print("当前信号状态")
-            print('─'*50)
-            signal_text = {2: '🔥 强烈买入', 1: '🔺 买入', -1: '🔻 卖出', -2: '💀 强烈卖出', 0: '⏸️  观望'}
-            print(f"  MA+MACD:  {signal_text.get(current_signals.get('signal', 0), '未知')}")
-            print(f"  布林带:   {signal_text.get(current_signals.get('signal_boll', 0), '未知')}")
-            print(f"  KDJ:      {signal_text.get(current_signals.get('signal_kdj', 0), '未知')}")
-            print(f"  RSI:      {signal_text.get(current_signals.get('signal_rsi', 0), '未知')}")
-            print(f"  成交量:   {signal_text.get(current_signals.get('signal_volume', 0), '未知')}")
-
-            # 综合策略 (醒目显示)
-            combined_signal = current_signals.get('signal_combined', 0)
-            combined_score = current_signals.get('score_combined', 0)
-            print(f"\n  {'━'*46}")
-            print(f"  【综合策略】 {signal_text.get(combined_signal, '未知')}  (评分: {combined_score:.0f})")
-            print(f"  {'━'*46}")
+# 多只股票并行分析的最大进程数（同时请求 tushare 的进程过多会触发频率限制）
+MAX_WORKERS = 4
 
-    else:
-        print("\n回测数据不足，无法给出建议")
 
-    print()
+def _analyze_worker(ts_code: str, name=None, mode='all', selected_strategies=None) -> str:
+    """在子进程中分析单只股票，输出写入缓冲区返回，由主进程按顺序打印"""
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        try:
+            analyze_stock(ts_code, mode, selected_strategies, name)
+        except Exception as e:
+            print(f"错误: {ts_code} 分析失败: {e}")
+    return buf.getvalue()
+
+
+def analyze_stocks(codes, mode='all', selected_strategies=None):
+    """分析多只股票：先批量获取股票名称，再多进程并行分析，按输入顺序输出"""
+    codes = [normalize_code(code) for code in codes]
+    if len(codes) == 1:
+        analyze_stock(codes[0], mode, selected_strategies)
+        return
+
+    names = get_stock_names(codes)
+    worker = partial(_analyze_worker, mode=mode, selected_strategies=selected_strategies)
+    max_workers = min(len(codes), os.cpu_count() or 1, MAX_WORKERS)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for output in executor.map(worker, codes, [names.get(code) for code in codes]):
+            print(output, end='')
 
 
 def main():
@@ -379,8 +413,7 @@ def main():
 
     # 检查命令行参数
     if args.codes:
-        for code in args.codes:
-            analyze_stock(code, mode, selected_strategies)
+        analyze_stocks(args.codes, mode, selected_strategies)
         return
 
     # 交互模式
@@ -399,9 +432,7 @@ def main():
                 continue
 
             # 支持多个代码，空格分隔
-            codes = code.split()
-            for c in codes:
-                analyze_stock(c, mode, selected_strategies)
+            analyze_stocks(code.split(), mode, selected_strategies)
 
         except KeyboardInterrupt:
             print("\n再见!")
@@ -0,0 +1,16 @@
+"""
+numba 兼容层
+安装了 numba 时使用 JIT 编译热点循环，未安装时退化为普通 Python 函数（结果一致）
+"""
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """无 numba 时的空装饰器，兼容 @njit 和 @njit(...) 两种写法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
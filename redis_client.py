@@ -0,0 +1,45 @@
+"""
+Redis连接模块
+进程内共享Redis连接，Redis未安装或不可用时返回None，由调用方回退到SQLite
+"""
+try:
+    import redis
+except ImportError:  # redis 为可选依赖
+    redis = None
+
+from config import REDIS_HOST, REDIS_PORT, REDIS_DB
+
+# decode_responses -> 连接（不可用时为None）
+_clients = {}
+
+
+def get_redis(decode_responses: bool = True):
+    """
+    获取Redis连接（单例）
+
+    Args:
+        decode_responses: 是否把返回值解码为str，存取二进制数据时传False
+
+    Returns:
+        redis.Redis 实例，不可用时返回 None
+    """
+    if decode_responses in _clients:
+        return _clients[decode_responses]
+
+    client = None
+    if redis is not None:
+        try:
+            client = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                decode_responses=decode_responses,
+                socket_connect_timeout=1
+            )
+            client.ping()
+        except redis.RedisError as e:
+            print(f"Redis不可用，回退到SQLite: {e}")
+            client = None
+
+    _clients[decode_responses] = client
+    return client
@@ -2,8 +2,300 @@
 买卖信号策略模块
 策略: 均线交叉 + MACD + 布林带 + KDJ 组合
 """
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
+from numba_compat import njit, prange, NUMBA_AVAILABLE
+
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+
+# 五个单项策略的信号列
+SIGNAL_COLUMNS = ['signal', 'signal_boll', 'signal_kdj', 'signal_rsi', 'signal_volume']
+
+# 综合策略权重（顺序同 SIGNAL_COLUMNS）
+# 权重分配：MA+MACD(30) + 布林带(20) + KDJ(15) + RSI(15) + 成交量(20) = 100
+SIGNAL_WEIGHTS = np.array([30, 20, 15, 15, 20], dtype=np.int16)
+
+# 综合评分分档: np.digitize 按左闭右开分档，总分为整数，
+# 故 <=-60、(-60,-40]、(-40,40)、[40,60)、>=60 对应分界 -59、-39、40、60
+_COMBINED_BINS = np.array([-59, -39, 40, 60])
+_COMBINED_LEVELS = np.array([-2, -1, 0, 1, 2], dtype=np.int8)
+
+# 信号文字，按 信号值+2 作下标查表（信号范围 -2~2）
+_SIGNAL_TEXT = np.array(['强烈卖出', '卖出信号', '无信号', '买入信号', '强烈买入'], dtype=object)
+
+# 信号计算的输入列（顺序与 _signal_kernel / _vectorized_signals 参数一致）
+_KERNEL_INPUTS = ['MA5', 'MA20', 'DIF', 'DEA', 'BOLL_POS', 'K', 'D', 'RSI',
+                  'close', 'high', 'low', 'VOL_RATIO']
+
+# 成交量突破策略的前期高低点窗口
+BREAKOUT_WINDOW = 20
+
+
+def _signal_array(buy: np.ndarray, sell: np.ndarray) -> np.ndarray:
+    """
+    由买卖条件生成信号数组: 买入1，卖出-1，其余0
+
+    先写卖出再写买入，两者同时成立时买入优先，与原逐日 if/elif 判断顺序一致
+    """
+    sig = np.zeros(len(buy), dtype=np.int8)
+    sig[sell] = -1
+    sig[buy] = 1
+    return sig
+
+
+def _rolling_high_low(high: np.ndarray, low: np.ndarray, window: int):
+    """
+    滚动最高价/最低价，窗口不足或含缺失值时为NaN（同 rolling(window).max()/min()）
+
+    安装了 bottleneck 时用其 move_max/move_min，否则使用 pandas
+    """
+    if bn is None or len(high) < window:
+        return (pd.Series(high).rolling(window=window).max().to_numpy(),
+                pd.Series(low).rolling(window=window).min().to_numpy())
+    return (bn.move_max(high, window, min_count=window),
+            bn.move_min(low, window, min_count=window))
+
+
+def _boll_bounces(boll_pos: np.ndarray):
+    """
+    布林带触底反弹/触顶回落判断
+
+    前一日和当日直接取错位切片比较，结果写入预分配数组，不生成前一日数组
+
+    Returns:
+        (触底反弹, 触顶回落) 两个布尔数组，首日均为False
+    """
+    bounce_up = np.zeros(len(boll_pos), dtype=bool)
+    bounce_down = np.zeros(len(boll_pos), dtype=bool)
+    prev, cur = boll_pos[:-1], boll_pos[1:]
+    # 触底反弹: 前一天在下轨以下或接近下轨，今天回到带内
+    np.logical_and((prev < 0.1) & (cur >= 0.1), cur < 0.5, out=bounce_up[1:])
+    # 触顶回落: 前一天在上轨以上或接近上轨，今天回落
+    np.logical_and((prev > 0.9) & (cur <= 0.9), cur > 0.5, out=bounce_down[1:])
+    return bounce_up, bounce_down
+
+
+def _crosses(fast: np.ndarray, slow: np.ndarray):
+    """
+    快线与慢线的交叉判断
+
+    Returns:
+        (fast>slow, 上穿, 下穿) 三个布尔数组；首日视为前一日不在上方
+    """
+    above = fast > slow
+    prev = np.empty_like(above)
+    prev[0] = False
+    prev[1:] = above[:-1]
+    return above, above & ~prev, ~above & prev
+
+
+@njit(cache=True)
+def _signal_kernel(ma5, ma20, dif, dea, boll_pos, k, d, rsi, close, high, low, vol_ratio):
+    """
+    单次遍历计算五个单项策略信号 (numba JIT)
+
+    每个交易日只读取当日和前一日的指标值，判断规则与 _vectorized_signals 完全一致。
+    不启用 fastmath：指标预热期为 NaN，必须保持 NaN 比较恒为 False 的语义。
+
+    Returns:
+        (5, n) 的 int8 数组，行顺序同 SIGNAL_COLUMNS
+    """
+    n = len(close)
+    out = np.zeros((5, n), dtype=np.int8)
+    for i in range(1, n):
+        # ===== 原有策略信号 =====
+        ma5_above = ma5[i] > ma20[i]
+        ma5_above_prev = ma5[i - 1] > ma20[i - 1]
+        dif_above = dif[i] > dea[i]
+        dif_above_prev = dif[i - 1] > dea[i - 1]
+        if (ma5_above and not ma5_above_prev and dif_above) or \
+                (dif_above and not dif_above_prev and ma5_above):
+            out[0, i] = 1
+        elif (ma5_above_prev and not ma5_above) or (dif_above_prev and not dif_above):
+            out[0, i] = -1
+
+        # ===== 布林带策略信号 =====
+        pos = boll_pos[i]
+        pos_prev = boll_pos[i - 1]
+        if pos_prev < 0.1 and pos >= 0.1 and pos < 0.5:
+            out[1, i] = 1
+        elif pos_prev > 0.9 and pos <= 0.9 and pos > 0.5:
+            out[1, i] = -1
+
+        # ===== KDJ策略信号 =====
+        k_above = k[i] > d[i]
+        k_above_prev = k[i - 1] > d[i - 1]
+        if k_above and not k_above_prev and k[i] < 50:
+            out[2, i] = 1
+        elif k_above_prev and not k_above and k[i] > 50:
+            out[2, i] = -1
+
+        # ===== RSI策略信号 =====
+        if rsi[i - 1] < rsi[i] and rsi[i] < 30:
+            out[3, i] = 1
+        elif rsi[i - 1] > rsi[i] and rsi[i] > 70:
+            out[3, i] = -1
+
+        # ===== 成交量突破策略信号 =====
+        # 前一日为止的20日最高/最低价，窗口不足或含缺失值时不判断突破
+        breakout_high = False
+        breakout_low = False
+        if i >= BREAKOUT_WINDOW:
+            high_20 = -np.inf
+            low_20 = np.inf
+            complete = True
+            for j in range(i - BREAKOUT_WINDOW, i):
+                if np.isnan(high[j]) or np.isnan(low[j]):
+                    complete = False
+                    break
+                high_20 = max(high_20, high[j])
+                low_20 = min(low_20, low[j])
+            if complete:
+                breakout_high = close[i] > high_20
+                breakout_low = close[i] < low_20
+        if breakout_high and vol_ratio[i] > 2.0:
+            out[4, i] = 1
+        elif breakout_low or vol_ratio[i] < 0.5:
+            out[4, i] = -1
+    return out
+
+
+@njit(cache=True, parallel=True)
+def _signal_kernel_batch(ma5, ma20, dif, dea, boll_pos, k, d, rsi, close, high, low, vol_ratio):
+    """
+    多只股票的信号内核 (numba JIT，按股票并行)
+
+    输入均为 (T, K) 数组，每列一只股票；每列从第一个有收盘价的交易日开始，
+    按 _signal_kernel 计算，结果与逐只计算一致
+
+    Returns:
+        (5, T, K) 的 int8 数组，第一维顺序同 SIGNAL_COLUMNS
+    """
+    n, m = close.shape
+    out = np.zeros((5, n, m), dtype=np.int8)
+    for j in prange(m):
+        start = 0
+        while start < n and np.isnan(close[start, j]):
+            start += 1
+        if n - start < 2:
+            continue
+        out[:, start:, j] = _signal_kernel(
+            ma5[start:, j], ma20[start:, j], dif[start:, j], dea[start:, j],
+            boll_pos[start:, j], k[start:, j], d[start:, j], rsi[start:, j],
+            close[start:, j], high[start:, j], low[start:, j], vol_ratio[start:, j])
+    return out
+
+
+def warmup(batch: bool = False):
+    """
+    预先编译信号内核（已有磁盘缓存时只是加载），避免首次 generate_signals 时等待JIT
+
+    内核都带 cache=True，构建部署镜像时调用一次即可把编译结果写入 __pycache__，
+    之后每个进程首次调用只需加载缓存。输入类型与实际调用一致，保证命中同一份缓存。
+
+    Args:
+        batch: 是否同时编译 generate_signals_batch 使用的并行内核
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    _signal_kernel(*np.zeros((len(_KERNEL_INPUTS), 2)))
+    if batch:
+        _signal_kernel_batch(*np.zeros((len(_KERNEL_INPUTS), 2, 1)))
+
+
+def _vectorized_signals(ma5, ma20, dif, dea, boll_pos, k, d, rsi, close, high, low, vol_ratio) -> tuple:
+    """
+    无 numba 时的向量化信号计算，参数和判断规则同 _signal_kernel
+
+    中间结果都是局部数组，不写入 DataFrame
+
+    Returns:
+        五个 int8 信号数组，顺序同 SIGNAL_COLUMNS
+    """
+    # 首日没有前一日数据，不产生信号
+    has_prev = np.ones(len(close), dtype=bool)
+    has_prev[0] = False
+
+    # ========== 原有 MA + MACD 策略 ==========
+    ma5_above, ma5_cross_up, ma5_cross_down = _crosses(ma5, ma20)
+    dif_above, dif_cross_up, dif_cross_down = _crosses(dif, dea)
+    signal = _signal_array(
+        buy=has_prev & ((ma5_cross_up & dif_above) | (dif_cross_up & ma5_above)),
+        sell=has_prev & (ma5_cross_down | dif_cross_down))
+
+    # ========== 布林带策略 ==========
+    boll_bounce_up, boll_bounce_down = _boll_bounces(boll_pos)
+    signal_boll = _signal_array(buy=boll_bounce_up, sell=boll_bounce_down)
+
+    # ========== KDJ策略 ==========
+    # 超卖区(K<30)金叉和中位(K<50)金叉都是买入，超买区(K>70)死叉和中位(K>50)死叉都是卖出
+    _, kdj_cross_up, kdj_cross_down = _crosses(k, d)
+    signal_kdj = _signal_array(buy=has_prev & kdj_cross_up & (k < 50),
+                               sell=has_prev & kdj_cross_down & (k > 50))
+
+    # ========== RSI策略 ==========
+    # 日变化量的符号判断反弹/回落，首日变化量记为0
+    rsi_change = np.zeros_like(rsi)
+    np.subtract(rsi[1:], rsi[:-1], out=rsi_change[1:])
+    rsi_bounce_up = (rsi_change > 0) & (rsi < 30)      # 超卖区反弹
+    rsi_bounce_down = (rsi_change < 0) & (rsi > 70)    # 超买区回落
+    signal_rsi = _signal_array(buy=rsi_bounce_up, sell=rsi_bounce_down)
+
+    # ========== 成交量突破策略 ==========
+    # 当日收盘价与截至前一日的20日最高/最低价比较（错位切片，首日为False）
+    high_20, low_20 = _rolling_high_low(high, low, BREAKOUT_WINDOW)
+    breakout_high = np.zeros(len(close), dtype=bool)
+    breakout_low = np.zeros(len(close), dtype=bool)
+    np.greater(close[1:], high_20[:-1], out=breakout_high[1:])  # 突破前期高点
+    np.less(close[1:], low_20[:-1], out=breakout_low[1:])       # 跌破前期低点
+    volume_surge = vol_ratio > 2.0          # 放量
+    volume_shrink = vol_ratio < 0.5         # 缩量
+    # 放量突破买入；跌破低点或缩量卖出
+    signal_volume = _signal_array(buy=breakout_high & volume_surge,
+                                  sell=has_prev & (breakout_low | volume_shrink))
+
+    return signal, signal_boll, signal_kdj, signal_rsi, signal_volume
+
+
+# 信号计算结果缓存：以输入数组的原始字节为键，相同的K线和指标不重复计算
+# （命中时字典按完整字节比较，不会因哈希碰撞误用其他股票的结果）
+SIGNAL_CACHE_SIZE = 128
+_signal_cache = OrderedDict()
+_signal_cache_lock = threading.Lock()
+
+
+def _compute_signals(inputs: np.ndarray) -> np.ndarray:
+    """
+    计算五个单项策略信号，相同输入直接返回缓存结果
+
+    Args:
+        inputs: (12, n) 输入数组，行顺序同 _KERNEL_INPUTS
+
+    Returns:
+        (5, n) int8 信号矩阵（缓存结果的副本，可安全修改）
+    """
+    key = inputs.tobytes()
+    # 多线程并发访问：查找/调整顺序/淘汰在锁内完成，信号计算在锁外进行
+    with _signal_cache_lock:
+        signals = _signal_cache.get(key)
+        if signals is not None:
+            _signal_cache.move_to_end(key)
+    if signals is None:
+        if NUMBA_AVAILABLE:
+            signals = _signal_kernel(*inputs)
+        else:
+            signals = np.stack(_vectorized_signals(*inputs))
+        with _signal_cache_lock:
+            _signal_cache[key] = signals
+            if len(_signal_cache) > SIGNAL_CACHE_SIZE:
+                _signal_cache.popitem(last=False)
+    return signals.copy()
 
 
 def generate_signals(df: pd.DataFrame) -> pd.DataFrame:
@@ -35,157 +327,125 @@ def generate_signals(df: pd.DataFrame) -> pd.DataFrame:
         df: 包含技术指标的 DataFrame
 
     Returns:
-        添加了 signal, signal_boll, signal_kdj, signal_rsi, signal_volume 列的 DataFrame
+        添加了 signal, signal_boll, signal_kdj, signal_rsi, signal_volume 等信号列的新 DataFrame
+        （输入本身不被修改，但与之共享K线和指标数据，需要原地修改这些列时请先 copy）
+    """
+    # 信号只有 -2~2，统一用 int8
+    if len(df) < 2:
+        # 数据不足，各策略均无信号
+        zeros = np.zeros(len(df), dtype=np.int8)
+        columns = dict.fromkeys(SIGNAL_COLUMNS + ['signal_combined'], zeros)
+    else:
+        signals = _compute_signals(np.stack([df[col].to_numpy(dtype=np.float64) for col in _KERNEL_INPUTS]))
+        columns = dict(zip(SIGNAL_COLUMNS, signals))
+
+        # ========== 综合策略 (加权评分) ==========
+        # (5, n) 信号矩阵与权重向量相乘，一次得到每日总分（范围 -100~100，int16 足够）
+        score = SIGNAL_WEIGHTS @ np.asarray(signals, dtype=np.int16)
+
+        # 根据总分生成综合信号
+        # 强买入(2): >= 60, 买入(1): >= 40, 观望(0): -40~40, 卖出(-1): <= -40, 强卖出(-2): <= -60
+        columns['signal_combined'] = _COMBINED_LEVELS[np.digitize(score, _COMBINED_BINS)]
+        columns['score_combined'] = score
+
+    # 信号列一次拼接到输入数据之后，不复制输入的K线和指标列
+    existing = df.columns.intersection(list(columns))
+    if len(existing):
+        df = df.drop(columns=existing)
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1, copy=False)
+
+
+def stack_indicators(frames: list) -> dict:
     """
-    df = df.copy()
+    把多只股票的指标 DataFrame 堆叠为 generate_signals_batch 的输入
 
-    # 初始化信号列
-    df['signal'] = 0         # 原有MA+MACD策略
-    df['signal_boll'] = 0    # 布林带策略
-    df['signal_kdj'] = 0     # KDJ策略
-    df['signal_rsi'] = 0     # RSI策略
-    df['signal_volume'] = 0  # 成交量突破策略
-    df['signal_combined'] = 0  # 综合策略
+    各股票按最近交易日对齐（末行对齐），历史较短的股票在顶部补NaN
 
-    # 确保有足够的数据
-    if len(df) < 2:
-        return df
+    Args:
+        frames: 包含技术指标的 DataFrame 列表
 
-    # ========== 原有 MA + MACD 策略 ==========
-    df['ma5_above'] = df['MA5'] > df['MA20']
-    ma5_above_prev = df['ma5_above'].shift(1).astype(bool).fillna(False)
-    df['ma5_cross_up'] = df['ma5_above'] & ~ma5_above_prev
-    df['ma5_cross_down'] = ~df['ma5_above'] & ma5_above_prev
+    Returns:
+        {列名: (T, K) float64 数组}，K 与 frames 顺序一致
+    """
+    length = max((len(df) for df in frames), default=0)
+    stacked = {col: np.full((length, len(frames)), np.nan) for col in _KERNEL_INPUTS}
+    for j, df in enumerate(frames):
+        for col in _KERNEL_INPUTS:
+            stacked[col][length - len(df):, j] = df[col].to_numpy(dtype=np.float64)
+    return stacked
 
-    df['dif_above'] = df['DIF'] > df['DEA']
-    dif_above_prev = df['dif_above'].shift(1).astype(bool).fillna(False)
-    df['dif_cross_up'] = df['dif_above'] & ~dif_above_prev
-    df['dif_cross_down'] = ~df['dif_above'] & dif_above_prev
 
-    # ========== 布林带策略 ==========
-    df['boll_pos_prev'] = df['BOLL_POS'].shift(1)
-    # 触底反弹: 前一天在下轨以下或接近下轨，今天回到带内
-    df['boll_bounce_up'] = (df['boll_pos_prev'] < 0.1) & (df['BOLL_POS'] >= 0.1) & (df['BOLL_POS'] < 0.5)
-    # 触顶回落: 前一天在上轨以上或接近上轨，今天回落
-    df['boll_bounce_down'] = (df['boll_pos_prev'] > 0.9) & (df['BOLL_POS'] <= 0.9) & (df['BOLL_POS'] > 0.5)
+def generate_signals_batch(indicators: dict) -> dict:
+    """
+    批量生成多只股票的买卖信号，规则同 generate_signals
 
-    # ========== KDJ策略 ==========
-    df['k_above_d'] = df['K'] > df['D']
-    k_above_prev = df['k_above_d'].shift(1).astype(bool).fillna(False)
-    df['kdj_cross_up'] = df['k_above_d'] & ~k_above_prev
-    df['kdj_cross_down'] = ~df['k_above_d'] & k_above_prev
+    Args:
+        indicators: {列名: (T, K) 数组}，每列一只股票，可由 stack_indicators 生成；
+                    历史较短的股票在顶部补NaN，从第一个有收盘价的交易日开始计算
 
-    # ========== RSI策略 ==========
-    df['rsi_prev'] = df['RSI'].shift(1)
-    df['rsi_oversold'] = df['RSI'] < 30  # 超卖区
-    df['rsi_overbought'] = df['RSI'] > 70  # 超买区
-    df['rsi_bounce_up'] = (df['rsi_prev'] < df['RSI']) & df['rsi_oversold']  # 超卖区反弹
-    df['rsi_bounce_down'] = (df['rsi_prev'] > df['RSI']) & df['rsi_overbought']  # 超买区回落
+    Returns:
+        {信号列名: (T, K) 数组}，包括 SIGNAL_COLUMNS 各列(int8)、score_combined(int16)、signal_combined(int8)
+    """
+    inputs = [np.asarray(indicators[col], dtype=np.float64) for col in _KERNEL_INPUTS]
+    close = inputs[_KERNEL_INPUTS.index('close')]
 
-    # ========== 成交量突破策略 ==========
-    # 计算20日最高价和最低价
-    df['high_20'] = df['high'].rolling(window=20).max()
-    df['low_20'] = df['low'].rolling(window=20).min()
-    df['high_20_prev'] = df['high_20'].shift(1)
-    df['low_20_prev'] = df['low_20'].shift(1)
-
-    # 突破判断
-    df['breakout_high'] = df['close'] > df['high_20_prev']  # 突破前期高点
-    df['breakout_low'] = df['close'] < df['low_20_prev']    # 跌破前期低点
-    df['volume_surge'] = df['VOL_RATIO'] > 2.0               # 放量
-    df['volume_shrink'] = df['VOL_RATIO'] < 0.5              # 缩量
-
-    for i in range(1, len(df)):
-        # ===== 原有策略信号 =====
-        if df['ma5_cross_up'].iloc[i] and df['dif_above'].iloc[i]:
-            df.iloc[i, df.columns.get_loc('signal')] = 1
-        elif df['dif_cross_up'].iloc[i] and df['ma5_above'].iloc[i]:
-            df.iloc[i, df.columns.get_loc('signal')] = 1
-        elif df['ma5_cross_down'].iloc[i] or df['dif_cross_down'].iloc[i]:
-            df.iloc[i, df.columns.get_loc('signal')] = -1
+    if NUMBA_AVAILABLE:
+        signals = _signal_kernel_batch(*inputs)
+    else:
+        n, m = close.shape
+        signals = np.zeros((5, n, m), dtype=np.int8)
+        starts = np.argmax(~np.isnan(close), axis=0) if n else []
+        for j, start in enumerate(starts):
+            if n - start >= 2:
+                signals[:, start:, j] = _vectorized_signals(*(values[start:, j] for values in inputs))
 
-        # ===== 布林带策略信号 =====
-        if df['boll_bounce_up'].iloc[i]:
-            df.iloc[i, df.columns.get_loc('signal_boll')] = 1
-        elif df['boll_bounce_down'].iloc[i]:
-            df.iloc[i, df.columns.get_loc('signal_boll')] = -1
+    score = np.tensordot(SIGNAL_WEIGHTS, signals.astype(np.int16), axes=1)
+    result = dict(zip(SIGNAL_COLUMNS, signals))
+    result['score_combined'] = score
+    result['signal_combined'] = _COMBINED_LEVELS[np.digitize(score, _COMBINED_BINS)]
+    return result
 
-        # ===== KDJ策略信号 =====
-        k_val = df['K'].iloc[i]
-        if df['kdj_cross_up'].iloc[i] and k_val < 30:
-            df.iloc[i, df.columns.get_loc('signal_kdj')] = 1
-        elif df['kdj_cross_up'].iloc[i] and k_val < 50:
-            # 中位金叉，弱买入信号
-            df.iloc[i, df.columns.get_loc('signal_kdj')] = 1
-        elif df['kdj_cross_down'].iloc[i] and k_val > 70:
-            df.iloc[i, df.columns.get_loc('signal_kdj')] = -1
-        elif df['kdj_cross_down'].iloc[i] and k_val > 50:
-            # 中位死叉，弱卖出信号
-            df.iloc[i, df.columns.get_loc('signal_kdj')] = -1
 
-        # ===== RSI策略信号 =====
-        if df['rsi_bounce_up'].iloc[i]:
-            # RSI超卖区反弹
-            df.iloc[i, df.columns.get_loc('signal_rsi')] = 1
-        elif df['rsi_bounce_down'].iloc[i]:
-            # RSI超买区回落
-            df.iloc[i, df.columns.get_loc('signal_rsi')] = -1
+# get_current_signal 读取的列（缺失的信号列按0、指标列按NaN处理）
+# 只要数值结果时读取信号列和收盘价，verbose 时另读生成原因说明用的指标列
+_CURRENT_SIGNAL_COLS = ('signal', 'signal_boll', 'signal_kdj', 'signal_rsi', 'signal_volume',
+                        'signal_combined', 'score_combined', 'close')
+_CURRENT_COLS = _CURRENT_SIGNAL_COLS + ('MA5', 'MA20', 'DIF', 'DEA', 'BOLL_UP', 'BOLL_MID',
+                                        'BOLL_DOWN', 'BOLL_POS', 'K', 'D', 'J')
 
-        # ===== 成交量突破策略信号 =====
-        if df['breakout_high'].iloc[i] and df['volume_surge'].iloc[i]:
-            # 放量突破
-            df.iloc[i, df.columns.get_loc('signal_volume')] = 1
-        elif df['breakout_low'].iloc[i] or df['volume_shrink'].iloc[i]:
-            # 跌破低点或缩量
-            df.iloc[i, df.columns.get_loc('signal_volume')] = -1
-
-    # 清理临时列
-    temp_cols = ['ma5_above', 'ma5_cross_up', 'ma5_cross_down',
-                 'dif_above', 'dif_cross_up', 'dif_cross_down',
-                 'boll_pos_prev', 'boll_bounce_up', 'boll_bounce_down',
-                 'k_above_d', 'kdj_cross_up', 'kdj_cross_down',
-                 'rsi_prev', 'rsi_oversold', 'rsi_overbought', 'rsi_bounce_up', 'rsi_bounce_down',
-                 'high_20', 'low_20', 'high_20_prev', 'low_20_prev',
-                 'breakout_high', 'breakout_low', 'volume_surge', 'volume_shrink']
-    df.drop(temp_cols, axis=1, inplace=True)
-
-    # ========== 综合策略 (加权评分) ==========
-    # 权重分配：MA+MACD(30) + 布林带(20) + 成交量(20) + KDJ(15) + RSI(15) = 100
-    df['score_combined'] = (
-        df['signal'] * 30 +         # MA+MACD
-        df['signal_boll'] * 20 +    # 布林带
-        df['signal_volume'] * 20 +  # 成交量突破
-        df['signal_kdj'] * 15 +     # KDJ
-        df['signal_rsi'] * 15       # RSI
-    )
-
-    # 根据总分生成综合信号
-    # 强买入(2): >= 60, 买入(1): >= 40, 观望(0): -40~40, 卖出(-1): <= -40, 强卖出(-2): <= -60
-    df['signal_combined'] = 0
-    df.loc[df['score_combined'] >= 60, 'signal_combined'] = 2
-    df.loc[(df['score_combined'] >= 40) & (df['score_combined'] < 60), 'signal_combined'] = 1
-    df.loc[(df['score_combined'] > -40) & (df['score_combined'] < 40), 'signal_combined'] = 0
-    df.loc[(df['score_combined'] <= -40) & (df['score_combined'] > -60), 'signal_combined'] = -1
-    df.loc[df['score_combined'] <= -60, 'signal_combined'] = -2
-
-    return df
-
-
-def get_current_signal(df: pd.DataFrame) -> dict:
+
+def _signal_text(signal) -> str:
+    """单个信号值对应的文字，不在 -2~2 内的值为“未知”"""
+    if -2 <= signal <= 2 and signal == int(signal):
+        return _SIGNAL_TEXT[int(signal) + 2]
+    return "未知"
+
+
+def signal_texts(signals: np.ndarray) -> np.ndarray:
+    """信号数组（如 generate_signals_batch 的结果）整体转换为文字数组"""
+    return _SIGNAL_TEXT[np.asarray(signals, dtype=np.intp) + 2]
+
+
+def get_current_signal(df: pd.DataFrame, verbose: bool = False) -> dict:
     """
     获取当前交易日的信号判断
 
     Args:
         df: 包含信号的 DataFrame
+        verbose: 是否生成信号文字和各指标的原因说明；默认只返回数值
 
     Returns:
-        当前信号详情，包括三个策略的独立信号
+        当前信号详情，包括各策略的独立信号、综合评分、收盘价和日期；
+        verbose=True 时另含 *_text 信号文字和 reasons/boll_reasons/kdj_reasons
     """
     if df.empty or len(df) < 2:
         return {'signal': 0, 'signal_text': '数据不足', 'reasons': []}
 
-    latest = df.iloc[-1]
-    prev = df.iloc[-2]
+    # 只取用到的列的最后两行（按列取底层数组），不构造整行 Series
+    columns = _CURRENT_COLS if verbose else _CURRENT_SIGNAL_COLS
+    tails = {col: df[col].to_numpy()[-2:].astype(np.float64) for col in columns if col in df.columns}
+    prev = {col: values[0] for col, values in tails.items()}
+    latest = {col: values[1] for col, values in tails.items()}
 
     signal = latest.get('signal', 0)
     signal_boll = latest.get('signal_boll', 0)
@@ -194,6 +454,20 @@ def get_current_signal(df: pd.DataFrame) -> dict:
     signal_volume = latest.get('signal_volume', 0)
     signal_combined = latest.get('signal_combined', 0)
     score_combined = latest.get('score_combined', 0)
+
+    if not verbose:
+        return {
+            'signal': signal,
+            'signal_boll': signal_boll,
+            'signal_kdj': signal_kdj,
+            'signal_rsi': signal_rsi,
+            'signal_volume': signal_volume,
+            'signal_combined': signal_combined,
+            'score_combined': score_combined,
+            'close': latest['close'],
+            'date': df.index[-1].strftime('%Y-%m-%d')
+        }
+
     reasons = []
 
     # 分析信号原因
@@ -285,28 +559,19 @@ def get_current_signal(df: pd.DataFrame) -> dict:
             else:
                 kdj_reasons.append(f"KDJ正常 K({k:.1f}) D({d:.1f}) J({j:.1f})")
 
-    # 信号文本
-    signal_text_map = {
-        2: "强烈买入",
-        1: "买入信号",
-        -1: "卖出信号",
-        -2: "强烈卖出",
-        0: "无信号"
-    }
-
     return {
         'signal': signal,
-        'signal_text': signal_text_map.get(signal, "未知"),
+        'signal_text': _signal_text(signal),
         'signal_boll': signal_boll,
-        'signal_boll_text': signal_text_map.get(signal_boll, "未知"),
+        'signal_boll_text': _signal_text(signal_boll),
         'signal_kdj': signal_kdj,
-        'signal_kdj_text': signal_text_map.get(signal_kdj, "未知"),
+        'signal_kdj_text': _signal_text(signal_kdj),
         'signal_rsi': signal_rsi,
-        'signal_rsi_text': signal_text_map.get(signal_rsi, "未知"),
+        'signal_rsi_text': _signal_text(signal_rsi),
         'signal_volume': signal_volume,
-        'signal_volume_text': signal_text_map.get(signal_volume, "未知"),
+        'signal_volume_text': _signal_text(signal_volume),
         'signal_combined': signal_combined,
-        'signal_combined_text': signal_text_map.get(signal_combined, "未知"),
+        'signal_combined_text': _signal_text(signal_combined),
         'score_combined': score_combined,
         'reasons': reasons,
         'boll_reasons': boll_reasons,
@@ -374,7 +639,7 @@ if __name__ == "__main__":
     print("\n" + "=" * 50)
     print("当前信号分析")
     print("=" * 50)
-    current = get_current_signal(df)
+    current = get_current_signal(df, verbose=True)
 
     print(f"\n日期: {current['date']}")
     print(f"收盘价: {current['close']:.2f}")